@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from models.aggregate_cube import AggregateCube
+from models.artifacts import ModelArtifact
+from models.comparables import ComparableIndex
+from models.conformal import fit_calibrated
+from models.dataset import DATA_PATH, load_dataset
+from models.feature_scaling import FeaturePreprocessor, prepare_features, preprocess_data
+from models.rule_predictor import GENRE_DATA, AccurateMoviePredictor
+from models.training import train_model
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, "results", "latest.json")
+
+# Batch sizes; rows are resampled from output.csv, "full" is the file itself
+SIZES = {"1k": 1000, "100k": 100000, "full": None}
+# One fixed configuration so the training benchmark measures fitting, not search
+TRAIN_GRID = {"n_estimators": [100], "max_depth": [6], "learning_rate": [0.1]}
+SUMMER_MONTHS = {"May", "June", "July", "August"}
+HOLIDAY_MONTHS = {"November", "December"}
+
+
+def resample(df, rows, seed=42):
+    if rows is None:
+        return df.reset_index(drop=True)
+    index = np.random.default_rng(seed).integers(0, len(df), rows)
+    return df.iloc[index].reset_index(drop=True)
+
+
+def films_from_dataset(df):
+    """Rule predictor inputs derived from real films in output.csv"""
+    genre = df["genre"].astype(str)
+    month = df["released"].astype(str).str.split(" ", n=1).str[0]
+    votes = df["votes"].to_numpy(dtype=float)
+    return {
+        "budget": np.maximum(df["budget"].to_numpy(dtype=float) / 1e6, 1.0),
+        "genre": np.where(genre.isin(list(GENRE_DATA)), genre, "Drama"),
+        "rating": df["score"].to_numpy(dtype=float),
+        "season": np.select([month.isin(SUMMER_MONTHS), month.isin(HOLIDAY_MONTHS)],
+                            ["Summer", "Holiday"], "Other Season"),
+        "has_star": votes >= np.median(votes),
+        "is_sequel": np.zeros(len(df), dtype=bool),
+    }
+
+
+def build_artifact(df):
+    # Trained in-process with fixed params so the suite needs no saved artifact
+    preprocessor = FeaturePreprocessor().fit(df)
+    X, y = prepare_features(df, preprocessor)
+    model = xgb.XGBRegressor(objective="reg:squarederror", random_state=42, **{
+        name: values[0] for name, values in TRAIN_GRID.items()
+    })
+    conformal = fit_calibrated(model, X, y)
+    metadata = {"version": "benchmark", "feature_names": list(preprocessor.feature_names), "conformal": conformal}
+    return ModelArtifact(model.get_booster(), preprocessor, metadata)
+
+
+def build_cases(df, sizes):
+    """(name, rows, function, max_repeats) for every benchmark"""
+    predictor = AccurateMoviePredictor()
+    artifact = build_artifact(df)
+    preprocessor = artifact.preprocessor
+    comparables = ComparableIndex(df)
+    cube = AggregateCube().add(df)
+    numpy_artifact = ModelArtifact(artifact.booster, preprocessor, artifact.metadata, numpy_trees=True)
+    inputs = df.drop(columns=["gross"])
+    record = inputs.iloc[0].to_dict()
+    film = {name: values[0] for name, values in films_from_dataset(df.iloc[:1]).items()}
+    # What the apps know about a planned film: budget, genre and expected rating
+    film_query = {"budget": float(df["budget"].iloc[0]), "genre": str(df["genre"].iloc[0]),
+                  "score": float(df["score"].iloc[0])}
+
+    cases = [
+        ("predict/single", 1, lambda: predictor.predict(**film), 100000),
+        ("predict_gross/single", 1, lambda: artifact.predict_gross(record), 100000),
+        ("predict_gross/single_numpy", 1, lambda: numpy_artifact.predict_gross(record), 100000),
+        ("predict_gross_interval/single", 1, lambda: artifact.predict_gross_interval(record), 100000),
+        ("comparables/single", 1, lambda: comparables.similar(film_query), 100000),
+        ("cube/lookup", 1, lambda: cube.summary(genre=film_query["genre"], month="June"), 100000),
+        ("cube/full", len(df), lambda: AggregateCube().add(df), 100),
+    ]
+    for label in sizes:
+        sample = resample(df, SIZES[label])
+        sample_inputs = sample.drop(columns=["gross"])
+        films = films_from_dataset(sample)
+        rows = len(sample)
+        cases += [
+            (f"predict/{label}", rows, lambda films=films: predictor.predict_batch(films), 1000),
+            (f"preprocess_data/{label}", rows, lambda sample=sample: preprocess_data(sample), 100),
+            (f"prepare_features/{label}", rows,
+             lambda sample=sample: prepare_features(sample, preprocessor), 100),
+            (f"predict_gross/{label}", rows,
+             lambda sample_inputs=sample_inputs: artifact.predict_gross_batch(sample_inputs), 100),
+            (f"predict_gross_interval/{label}", rows,
+             lambda sample_inputs=sample_inputs: artifact.predict_gross_interval_batch(sample_inputs), 100),
+            (f"comparables/{label}", rows,
+             lambda queries={column: sample[column] for column in film_query}: comparables.query(queries), 100),
+        ]
+    cases.append(("train_model/full", len(df), lambda: train_model(df, TRAIN_GRID, cv=3), 3))
+    return cases
+
+
+def measure(function, rows, max_repeats, min_time=0.5, min_repeats=3):
+    """Latency percentiles, throughput and peak traced memory of function()"""
+    function()  # warm up caches and lazy imports
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < max_repeats and (
+        len(latencies) < min_repeats or time.perf_counter() - started < min_time
+    ):
+        call_started = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - call_started)
+
+    # A separate traced run, since tracemalloc slows every allocation down.
+    # It sees Python and NumPy allocations, not XGBoost's native ones.
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    milliseconds = np.array(latencies) * 1000
+    p50, p90, p99 = np.percentile(milliseconds, [50, 90, 99])
+    return {
+        "rows": rows,
+        "repeats": len(latencies),
+        "latency_ms": {
+            "p50": float(p50),
+            "p90": float(p90),
+            "p99": float(p99),
+            "min": float(milliseconds.min()),
+        },
+        "throughput_rows_per_s": rows / (p50 / 1000),
+        "peak_memory_mb": peak / 2**20,
+    }
+
+
+def environment():
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "xgboost": xgb.__version__,
+    }
+
+
+def compare(results, baseline, threshold, memory_threshold):
+    """Benchmarks whose p50 latency or peak memory grew beyond the thresholds"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        time_ratio = result["latency_ms"]["p50"] / base["latency_ms"]["p50"]
+        if time_ratio > 1 + threshold:
+            regressions.append(f"{name}: p50 {base['latency_ms']['p50']:.3f} -> "
+                               f"{result['latency_ms']['p50']:.3f} ms ({time_ratio:.2f}x)")
+        # Allow 1 MB of slack so tiny allocations do not flap
+        memory_limit = base["peak_memory_mb"] * (1 + memory_threshold) + 1
+        if result["peak_memory_mb"] > memory_limit:
+            regressions.append(f"{name}: peak memory {base['peak_memory_mb']:.1f} -> "
+                               f"{result['peak_memory_mb']:.1f} MB")
+    return regressions
+
+
+def print_table(results, baseline):
+    print(f"{'benchmark':<30}{'rows':>8}{'p50 ms':>11}{'p99 ms':>11}{'rows/s':>14}{'peak MB':>9}{'vs base':>9}")
+    for name, result in results.items():
+        latency = result["latency_ms"]
+        base = baseline.get(name)
+        change = f"{latency['p50'] / base['latency_ms']['p50']:.2f}x" if base else "-"
+        print(f"{name:<30}{result['rows']:>8,}{latency['p50']:>11.3f}{latency['p99']:>11.3f}"
+              f"{result['throughput_rows_per_s']:>14,.0f}{result['peak_memory_mb']:>9.1f}{change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prediction, preprocessing and training")
+    parser.add_argument("--data", default=DATA_PATH, help="Dataset CSV")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write this run's JSON results")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed p50 latency growth over the baseline (0.25 = 25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.25,
+                        help="Allowed peak memory growth over the baseline")
+    parser.add_argument("--only", default=None,
+                        help="Comma-separated benchmark name prefixes, e.g. predict/,train_model")
+    parser.add_argument("--quick", action="store_true", help="Skip the 100k row batches")
+    args = parser.parse_args()
+
+    df = load_dataset(csv_path=args.data)
+    sizes = [label for label in SIZES if not (args.quick and label == "100k")]
+    prefixes = args.only.split(",") if args.only else None
+
+    results = {}
+    for name, rows, function, max_repeats in build_cases(df, sizes):
+        if prefixes and not name.startswith(tuple(prefixes)):
+            continue
+        results[name] = measure(function, rows, max_repeats)
+        print(f"  {name}: p50 {results[name]['latency_ms']['p50']:.3f} ms", file=sys.stderr)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    run = dict(environment(), results=results)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(run, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+
+    print_table(results, baseline)
+    regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond the threshold:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions. Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, "results", "startup.json")
+
+# Cumulative import time budget per entry point, in milliseconds
+STARTUP_BUDGETS_MS = {
+    "main": 300,
+    "server": 350,
+}
+# Wall time from launch to the first prompt, in milliseconds, for scripts run as a user would
+PROMPT_BUDGETS_MS = {
+    "main.py": 400,
+}
+# Modules the rule-based entry points must not pull in at startup
+HEAVY_MODULES = ("pandas", "xgboost", "sklearn", "scipy", "matplotlib", "pyarrow", "streamlit")
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def import_profile(module):
+    """(total ms, ms per direct import of module, loaded module names) in a fresh interpreter"""
+    code = f"import {module}, sys; print(','.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, cwd=REPO_ROOT, check=True)
+    # importtime prints children before their parent, indented two more spaces
+    children = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        depth = len(match.group(3))
+        name = match.group(4)
+        cumulative_ms = int(match.group(2)) / 1000
+        if depth == 3:
+            children[name] = cumulative_ms
+        elif depth == 1:
+            if name == module:
+                return cumulative_ms, children, set(result.stdout.strip().split(","))
+            children = {}
+    raise RuntimeError(f"{module} was already imported at interpreter startup")
+
+
+def wall_time(code):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, check=True)
+    return time.perf_counter() - started
+
+
+def prompt_profile(script):
+    """(wall ms, loaded module names) for running script until it first reads stdin
+
+    stdin is closed, so the first input() raises EOFError and the script
+    exits there; everything it did before the prompt (building the
+    predictor, loading the rules) is included.
+    """
+    code = (f"import runpy, sys\n"
+            f"sys.argv = [{script!r}]\n"
+            f"try:\n"
+            f"    runpy.run_path({script!r}, run_name='__main__')\n"
+            f"finally:\n"
+            f"    sys.stderr.write(','.join(sys.modules))\n")
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code], stdin=subprocess.DEVNULL,
+                            capture_output=True, text=True, cwd=REPO_ROOT)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return elapsed_ms, set(result.stderr.strip().splitlines()[-1].split(","))
+
+
+def measure_prompt(script, runs=5):
+    wall_ms = []
+    for _ in range(runs):
+        elapsed_ms, loaded = prompt_profile(script)
+        wall_ms.append(elapsed_ms)
+    return {
+        "wall_ms": statistics.median(wall_ms),
+        "heavy_modules": sorted(name for name in HEAVY_MODULES if name in loaded),
+    }
+
+
+def measure_startup(module, runs=5):
+    import_ms = []
+    wall_ms = []
+    for _ in range(runs):
+        total_ms, children, loaded = import_profile(module)
+        import_ms.append(total_ms)
+        wall_ms.append(wall_time(f"import {module}") * 1000)
+
+    # Slowest direct imports of module, from the last run
+    slowest = sorted(children.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "import_ms": statistics.median(import_ms),
+        "wall_ms": statistics.median(wall_ms),
+        "heavy_modules": sorted(name for name in HEAVY_MODULES if name in loaded),
+        "slowest_imports_ms": {name: round(ms, 1) for name, ms in slowest[:5]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of the CLI entry points")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per entry point")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write the JSON results")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiply every budget, e.g. 2 on a slow machine")
+    args = parser.parse_args()
+
+    interpreter_ms = statistics.median(wall_time("pass") * 1000 for _ in range(args.runs))
+    results = {"interpreter_ms": interpreter_ms, "entry_points": {}, "first_prompt": {}}
+    failures = []
+    print(f"Bare interpreter: {interpreter_ms:.0f} ms")
+    for module, budget in STARTUP_BUDGETS_MS.items():
+        result = measure_startup(module, args.runs)
+        result["budget_ms"] = budget * args.scale
+        results["entry_points"][module] = result
+
+        print(f"{module}: imports in {result['import_ms']:.0f} ms (budget {result['budget_ms']:.0f} ms), "
+              f"process {result['wall_ms']:.0f} ms")
+        for name, ms in result["slowest_imports_ms"].items():
+            print(f"    {name:<30}{ms:>8.1f} ms")
+        if result["import_ms"] > result["budget_ms"]:
+            failures.append(f"{module} imports in {result['import_ms']:.0f} ms, over its "
+                            f"{result['budget_ms']:.0f} ms budget")
+        if result["heavy_modules"]:
+            failures.append(f"{module} imports {', '.join(result['heavy_modules'])} at startup")
+
+    for script, budget in PROMPT_BUDGETS_MS.items():
+        result = measure_prompt(script, args.runs)
+        result["budget_ms"] = budget * args.scale
+        results["first_prompt"][script] = result
+
+        print(f"{script}: first prompt after {result['wall_ms']:.0f} ms (budget {result['budget_ms']:.0f} ms)")
+        if result["wall_ms"] > result["budget_ms"]:
+            failures.append(f"{script} reaches its first prompt in {result['wall_ms']:.0f} ms, over its "
+                            f"{result['budget_ms']:.0f} ms budget")
+        if result["heavy_modules"]:
+            failures.append(f"{script} imports {', '.join(result['heavy_modules'])} before its first prompt")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if failures:
+        print("\nStartup budget exceeded:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print(f"\nAll entry points within budget. Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
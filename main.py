@@ -1,111 +1,16 @@
-import pandas as pd
-import numpy as np
-import xgboost as xgb
-from sklearn.preprocessing import StandardScaler
+import argparse
+import functools
+import sys
 
-class AccurateMoviePredictor:
-    def __init__(self):
-        self.genre_data = {
-            'Action': {'multiplier': 1.8, 'risk': 'Medium', 'description': 'Global appeal, good ROI'},
-            'Adventure': {'multiplier': 1.7, 'risk': 'Medium', 'description': 'Family friendly, stable'},
-            'Animation': {'multiplier': 2.0, 'risk': 'Low', 'description': 'Best for families, great ROI'},
-            'Comedy': {'multiplier': 1.3, 'risk': 'High', 'description': 'Domestic focus, mixed results'},
-            'Drama': {'multiplier': 1.1, 'risk': 'Very High', 'description': 'Niche audience, risky'},
-            'Horror': {'multiplier': 2.5, 'risk': 'Very Low', 'description': 'Best ROI, low budget works'},
-            'Romance': {'multiplier': 0.8, 'risk': 'Very High', 'description': 'Limited audience, high risk'},
-            'Sci-Fi': {'multiplier': 1.6, 'risk': 'Medium', 'description': 'Global but expensive'},
-            'Thriller': {'multiplier': 1.2, 'risk': 'Medium', 'description': 'Adult audience, steady'}
-        }
-        
-    def predict(self, budget, genre, rating, season, has_star, is_sequel):
-        """ACCURATE prediction based on real industry data"""
-        
-        # Start with budget
-        base_revenue = budget
-        
-        # Apply rating effect
-        if rating >= 8.0:
-            base_revenue *= 3.0
-            rating_effect = "Great movies attract more viewers"
-        elif rating >= 7.0:
-            base_revenue *= 2.0
-            rating_effect = "Good quality brings steady audience"
-        elif rating >= 6.0:
-            base_revenue *= 1.3
-            rating_effect = "Average movies struggle to attract viewers"
-        elif rating >= 5.0:
-            base_revenue *= 0.9
-            rating_effect = "Poor quality significantly hurts box office"
-        else:
-            base_revenue *= 0.6
-            rating_effect = "Very poor quality leads to box office disaster"
-        
-        # Apply genre multiplier
-        genre_multiplier = self.genre_data[genre]['multiplier']
-        base_revenue *= genre_multiplier
-        genre_effect = f"{genre} movies typically make {genre_multiplier}x budget"
-        
-        # Season effect
-        if season == "Summer":
-            base_revenue *= 1.4
-            season_effect = "Summer releases get 40% more viewers"
-        elif season == "Holiday":
-            base_revenue *= 1.3
-            season_effect = "Holiday season boosts attendance"
-        else:
-            base_revenue *= 0.9
-            season_effect = "Off-season releases have fewer viewers"
-        
-        # Star power
-        if has_star:
-            base_revenue *= 1.2
-            star_effect = "Famous actors help but cannot save bad movies"
-        else:
-            base_revenue *= 1.0
-            star_effect = "No big stars - needs strong marketing"
-        
-        # Sequel bonus
-        if is_sequel:
-            base_revenue *= 1.3
-            sequel_effect = "Sequels have some built-in audience"
-        else:
-            base_revenue *= 1.0
-            sequel_effect = "Original movie - needs to build audience"
-        
-        # BIG BUDGET PENALTY
-        if budget > 100 and rating < 7.0:
-            base_revenue *= 0.7
-            budget_effect = "Big budget with average quality = High risk"
-        elif budget > 200 and rating < 7.5:
-            base_revenue *= 0.6
-            budget_effect = "Huge budget needs excellent quality to succeed"
-        else:
-            budget_effect = "Budget matches quality expectations"
-        
-        # ROMANCE GENRE PENALTY
-        if genre == 'Romance' and budget > 50:
-            base_revenue *= 0.6
-            romance_effect = "Romance genre cannot sustain big budgets"
-        elif genre == 'Romance':
-            romance_effect = "Romance works best with smaller budgets"
-        else:
-            romance_effect = "Genre has reasonable box office potential"
-        
-        # Add realistic variation
-        variation = np.random.normal(1.0, 0.15)
-        predicted_revenue = base_revenue * variation
-        
-        effects = {
-            'rating': rating_effect,
-            'genre': genre_effect,
-            'season': season_effect,
-            'star': star_effect,
-            'sequel': sequel_effect,
-            'budget_risk': budget_effect,
-            'genre_risk': romance_effect
-        }
-        
-        return max(predicted_revenue, budget * 0.3), effects
+from models.prediction_cache import PredictionCache
+from models.rule_predictor import (
+    BUDGET_OBJECTIVES,
+    MARKETING_RATIO,
+    RESULT_MESSAGES,
+    RESULT_TYPES,
+    AccurateMoviePredictor,
+    classify_results,
+)
 
 def display_header():
     print("\n" + "="*70)
@@ -185,7 +90,8 @@ def get_movie_input():
     
     return movie_name, genre, budget, rating, season, has_star, is_sequel
 
-def display_results(movie_name, budget, predicted_revenue, profit, roi, result_type, result_message, effects):
+def display_results(movie_name, budget, predicted_revenue, profit, roi, result_type, result_message, effects, budget_plans,
+                    comparables=None):
     print("\n" + "="*70)
     print("📊 YOUR PREDICTION RESULTS")
     print("="*70)
@@ -202,7 +108,7 @@ def display_results(movie_name, budget, predicted_revenue, profit, roi, result_t
     print(f"   Return on Investment: {roi:+.1f}%")
     
     # Financial breakdown
-    marketing_cost = budget * 0.5
+    marketing_cost = budget * MARKETING_RATIO
     total_cost = budget + marketing_cost
     
     print(f"\n📈 FINANCIAL BREAKDOWN:")
@@ -230,15 +136,28 @@ def display_results(movie_name, budget, predicted_revenue, profit, roi, result_t
         print("   🎯 Focus marketing on right audience")
         print("   🤝 Consider partners to reduce risk")
     else:
+        best = budget_plans['profit']
         print("   🚨 MAJOR CHANGES NEEDED!")
-        print("   💰 REDUCE BUDGET by 40-60% immediately")
+        if best['profit'] > 0:
+            print(f"   💰 CHANGE BUDGET to ${best['budget']:,.0f}M (expected profit ${best['profit']:,.0f}M)")
+        else:
+            print("   💰 NO BUDGET makes this plan profitable - change the factors below")
         print("   ⭐ IMPROVE QUALITY to 7.5+ rating")
         print("   🎭 CONSIDER GENRE CHANGE to Action/Horror")
         print("   📅 MOVE TO SUMMER release window")
     
+    display_budget_plans(budget, budget_plans)
+    
     # Real world comparison
     print(f"\n🎬 REAL WORLD COMPARISON:")
-    if profit < -50:
+    if comparables:
+        print("   Most similar real films (budget, genre, rating):")
+        for film in comparables:
+            outcome = "Profit" if film['profit'] >= 0 else "Loss"
+            print(f"   • {film['name']} ({film['year']}, {film['genre']}): Budget ${film['budget'] / 1e6:,.1f}M, "
+                  f"Gross ${film['gross'] / 1e6:,.0f}M, {outcome} ${abs(film['profit']) / 1e6:,.0f}M "
+                  f"({film['roi']:+.0f}% ROI)")
+    elif profit < -50:
         print("   Similar to MAJOR BOX OFFICE FLOPS:")
         print("   • Radhe Shyam: Budget $150M, Loss $70M (-47% ROI)")
         print("   • John Carter: Budget $263M, Loss $200M (-76% ROI)")
@@ -247,12 +166,45 @@ def display_results(movie_name, budget, predicted_revenue, profit, roi, result_t
         print("   • Black Panther: Budget $200M, Profit $1147M (+573% ROI)")
         print("   • Get Out: Budget $4.5M, Profit $250M (+5556% ROI)")
 
-def predict_movie():
+def display_budget_plans(budget, budget_plans):
+    labels = {
+        'profit': "Most profit",
+        'roi': "Best ROI",
+        'risk_adjusted': "Safest (best P10 profit)",
+    }
+    print(f"\n🎯 BEST BUDGET FOR THIS MOVIE (you chose ${budget}M):")
+    for objective, label in labels.items():
+        plan = budget_plans[objective]
+        print(f"   {label}: ${plan['budget']:,.0f}M → Profit ${plan['profit']:,.0f}M, "
+              f"ROI {plan['roi']:+.1f}%, P10 Profit ${plan['p10_profit']:,.0f}M")
+
+def display_outcome_range(simulation):
+    revenue = simulation['revenue']
+    profit = simulation['profit']
+    roi = simulation['roi']
+    
+    print(f"\n🎲 RANGE OF OUTCOMES ({simulation['n_samples']:,} simulations):")
+    print(f"   Pessimistic (P10): Revenue ${revenue['p10']:,.0f}M, Profit ${profit['p10']:,.0f}M, ROI {roi['p10']:+.1f}%")
+    print(f"   Typical (P50):     Revenue ${revenue['p50']:,.0f}M, Profit ${profit['p50']:,.0f}M, ROI {roi['p50']:+.1f}%")
+    print(f"   Optimistic (P90):  Revenue ${revenue['p90']:,.0f}M, Profit ${profit['p90']:,.0f}M, ROI {roi['p90']:+.1f}%")
+    print(f"   Chance of Flop: {simulation['prob_flop']:.0%} • Chance of Blockbuster: {simulation['prob_blockbuster']:.0%}")
+
+@functools.lru_cache(maxsize=None)
+def load_comparables():
+    # Loaded on the first comparison, so the prompts start without pandas or scikit-learn
+    try:
+        from models.comparables import load_index
+        return load_index()
+    except OSError as error:
+        print(f"\n⚠️  Real film comparisons unavailable: {error}")
+        return None
+
+def predict_movie(deterministic=False):
     display_header()
     display_quick_tips()
     
     # Initialize predictor
-    predictor = AccurateMoviePredictor()
+    predictor = AccurateMoviePredictor(deterministic=deterministic, cache=PredictionCache())
     
     while True:
         # Get input
@@ -275,29 +227,31 @@ def predict_movie():
         # Get prediction
         print("\n🤖 Running accurate industry analysis...")
         predicted_revenue, effects = predictor.predict(budget, genre, rating, season, has_star, is_sequel)
+        simulation = predictor.simulate(budget, genre, rating, season, has_star, is_sequel)
+        budget_plans = {
+            objective: predictor.optimize_budget(genre, rating, season, has_star, is_sequel, objective,
+                                                 min_budget=min(1, budget), max_budget=max(500, budget))
+            for objective in BUDGET_OBJECTIVES
+        }
         
         # Calculate finances
-        marketing_cost = budget * 0.5
+        marketing_cost = budget * MARKETING_RATIO
         total_cost = budget + marketing_cost
         profit = predicted_revenue - total_cost
         roi = (profit / total_cost) * 100
         
         # Determine result
-        if profit > budget * 1.5:
-            result_type = "BLOCKBUSTER HIT"
-            result_message = "Exceptional success! Similar to major Hollywood hits."
-        elif profit > 0:
-            result_type = "PROFITABLE"
-            result_message = "Good investment! Should make solid profit."
-        elif profit > -budget * 0.3:
-            result_type = "BREAK-EVEN"
-            result_message = "Might break even or small loss. Needs careful management."
-        else:
-            result_type = "BOX OFFICE FLOP"
-            result_message = "High risk of significant losses. Major changes needed."
+        result_code = int(classify_results(profit, budget))
+        result_type = RESULT_TYPES[result_code]
+        result_message = RESULT_MESSAGES[result_code]
+        
+        comparables = load_comparables()
+        similar = comparables.similar({'budget': budget * 1e6, 'genre': genre, 'score': rating}) if comparables else None
         
         # Display results
-        display_results(movie_name, budget, predicted_revenue, profit, roi, result_type, result_message, effects)
+        display_results(movie_name, budget, predicted_revenue, profit, roi, result_type, result_message, effects, budget_plans,
+                        similar)
+        display_outcome_range(simulation)
         
         # Ask to continue
         print("\n" + "="*70)
@@ -306,10 +260,31 @@ def predict_movie():
             print("\nThank you for using Movie Success Predictor! 🎬")
             break
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Movie Success Predictor")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="Predict the typical outcome instead of a random draw")
+    subcommands = parser.add_subparsers(dest="command")
+    
+    score = subcommands.add_parser("score", help="Score a CSV/JSONL file of films without prompts")
+    score.add_argument("input", help="CSV or JSONL with budget, genre, rating, season, has_star, is_sequel")
+    score.add_argument("-o", "--output", required=True, help="CSV or JSONL file to write results to")
+    score.add_argument("--chunksize", type=int, default=100000, help="Rows per chunk")
+    score.add_argument("--workers", type=int, default=None, help="Worker processes (default: all CPUs)")
+    score.add_argument("--seed", type=int, default=42, help="Seed for the revenue variation")
+    
+    return parser.parse_args()
+
 # Main program
 if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "score":
+        from models import batch_scoring
+        batch_scoring.main(args)
+        sys.exit(0)
+    
     try:
-        predict_movie()
+        predict_movie(args.deterministic)
     except KeyboardInterrupt:
         print("\n\nProgram interrupted. Thank you for using Movie Success Predictor! 🎬")
     except Exception as e:
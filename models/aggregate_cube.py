@@ -0,0 +1,218 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+from models import instrumentation
+from models.files import atomic_write
+
+
+# Same default as models.dataset.DATA_PATH, without importing pyarrow to read it
+DATA_PATH = "revised_datasets/output.csv"
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August",
+          "September", "October", "November", "December", "Unknown"]
+YEAR_BUCKET = 10
+# Histogram of log(gross / budget): fixed bins of 1/8 between these, open-ended outside
+LOG_RATIO_EDGES = np.linspace(-6, 6, 97)
+DIMENSIONS = ["genre", "month", "year_bucket", "rating"]
+COLUMNS = ["name", "genre", "released", "year", "rating", "budget", "gross"]
+
+
+def cube_path(csv_path=DATA_PATH):
+    return os.path.splitext(csv_path)[0] + ".cube.npz"
+
+
+class AggregateCube:
+    """Distribution of gross / budget by genre, release month, year bucket and MPAA rating
+
+    counts[genre, month, year bucket, rating, bin] is a histogram of
+    log(gross / budget) over LOG_RATIO_EDGES, and log_sum / log_squares
+    hold per-cell sums for means and spreads. Every measure is a sum, so
+    appended rows are folded in with add() and any slice is answered from
+    cached marginals by index. Labels grow as new genres, ratings or
+    decades appear.
+    """
+
+    def __init__(self):
+        self.labels = {"genre": [], "month": list(MONTHS), "year_bucket": [], "rating": []}
+        self.counts = np.zeros((0, len(MONTHS), 0, 0, len(LOG_RATIO_EDGES) + 1), dtype=np.int32)
+        self.log_sum = np.zeros(self.counts.shape[:-1])
+        self.log_squares = np.zeros(self.counts.shape[:-1])
+        self.rows = 0
+        self.last_film = None
+        self._margins = {}
+
+    @instrumentation.instrumented("cube.add")
+    def add(self, df):
+        """Fold the rows of a DataFrame into the cube in one pass"""
+        if not len(df):
+            return self
+        budget = df["budget"].to_numpy(dtype=float)
+        gross = df["gross"].to_numpy(dtype=float)
+        # Films without a usable budget or gross still count as rows seen
+        valid = (budget > 0) & (gross > 0)
+        log_ratio = np.log(gross[valid] / budget[valid])
+
+        months = df["released"].astype(str).str.extract(r"^([A-Za-z]+)", expand=False)
+        values = {
+            "genre": df["genre"].astype(str).to_numpy(),
+            "month": months.where(months.isin(MONTHS), "Unknown").to_numpy(),
+            "year_bucket": (df["year"].to_numpy(dtype=int) // YEAR_BUCKET * YEAR_BUCKET).astype(str),
+            "rating": df["rating"].astype(str).to_numpy(),
+        }
+        codes = [self._codes(dimension, values[dimension][valid]) for dimension in DIMENSIONS]
+        cell = np.ravel_multi_index(codes, self.log_sum.shape)
+        bins = np.searchsorted(LOG_RATIO_EDGES, log_ratio, side="right")
+
+        cells = self.log_sum.size
+        # Counts per occupied (cell, bin) only; the dense cube is mostly empty
+        keys, counts = np.unique(cell * self.counts.shape[-1] + bins, return_counts=True)
+        self.counts.reshape(-1)[keys] += counts.astype(np.int32)
+        self.log_sum += np.bincount(cell, weights=log_ratio, minlength=cells).reshape(self.log_sum.shape)
+        self.log_squares += np.bincount(cell, weights=log_ratio ** 2, minlength=cells).reshape(self.log_sum.shape)
+
+        self.rows += len(df)
+        self.last_film = [str(df["name"].iloc[-1]), int(df["year"].iloc[-1])]
+        self._margins = {}
+        return self
+
+    def _codes(self, dimension, values):
+        # Append unseen labels, padding every array along that axis
+        labels = self.labels[dimension]
+        new = sorted(set(np.unique(values).tolist()) - set(labels))
+        if new:
+            labels.extend(new)
+            self._margins = {}
+            axis = DIMENSIONS.index(dimension)
+            for name in ("counts", "log_sum", "log_squares"):
+                array = getattr(self, name)
+                padding = [(0, 0)] * array.ndim
+                padding[axis] = (0, len(new))
+                setattr(self, name, np.pad(array, padding))
+        uniques, inverse = np.unique(values, return_inverse=True)
+        codes = self._label_codes()[dimension]
+        return np.array([codes[label] for label in uniques.tolist()], dtype=np.intp)[inverse.reshape(-1)]
+
+    def _label_codes(self):
+        if "codes" not in self._margins:
+            self._margins["codes"] = {
+                dimension: {label: code for code, label in enumerate(labels)}
+                for dimension, labels in self.labels.items()
+            }
+        return self._margins["codes"]
+
+    def cell(self, **selection):
+        """(histogram, log sum, log sum of squares) for a slice, e.g. cell(genre="Horror", month="October")
+
+        Dimensions left out are summed over. Marginals are computed once per
+        set of selected dimensions, so each lookup is an index. Labels the
+        cube has never seen give an empty cell.
+        """
+        unknown = set(selection) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions: {', '.join(sorted(unknown))}")
+        selected = tuple(dimension for dimension in DIMENSIONS if selection.get(dimension) is not None)
+        margins = self._margins.get(selected)
+        if margins is None:
+            summed = tuple(axis for axis, dimension in enumerate(DIMENSIONS) if dimension not in selected)
+            margins = self._margins[selected] = tuple(
+                array.sum(axis=summed) for array in (self.counts, self.log_sum, self.log_squares)
+            )
+        codes = self._label_codes()
+        index = tuple(codes[dimension].get(str(selection[dimension])) for dimension in selected)
+        if None in index:
+            return np.zeros(self.counts.shape[-1], dtype=np.int64), 0.0, 0.0
+        return margins[0][index], float(margins[1][index]), float(margins[2][index])
+
+    def summary(self, **selection):
+        """Film count, median ratio, share below a ratio of 1 and log-ratio spread for a slice"""
+        return summarize(*self.cell(**selection))
+
+    def months_summary(self, months, **selection):
+        """summary() over several release months together, such as a season"""
+        cells = [self.cell(month=month, **selection) for month in months]
+        return summarize(*(sum(parts) for parts in zip(*cells)))
+
+    def save(self, path):
+        # A file object, so numpy does not append .npz to the temporary name
+        with atomic_write(path) as temporary_path, open(temporary_path, "wb") as f:
+            np.savez_compressed(
+                f, counts=self.counts, log_sum=self.log_sum, log_squares=self.log_squares,
+                state=np.array(json.dumps({"labels": self.labels, "rows": self.rows, "last_film": self.last_film})),
+            )
+
+    @classmethod
+    def load(cls, path):
+        cube = cls()
+        with np.load(path, allow_pickle=False) as data:
+            state = json.loads(str(data["state"]))
+            cube.counts, cube.log_sum, cube.log_squares = data["counts"], data["log_sum"], data["log_squares"]
+        cube.labels, cube.rows, cube.last_film = state["labels"], state["rows"], state["last_film"]
+        return cube
+
+
+def summarize(histogram, log_sum, log_squares):
+    films = int(histogram.sum())
+    if not films:
+        return {"films": 0, "median_ratio": None, "flop_share": None, "log_std": None}
+    mean = log_sum / films
+    return {
+        "films": films,
+        "median_ratio": float(np.exp(histogram_quantile(histogram, 0.5))),
+        # 0 is an edge, so the bins below it hold exactly the films that lost money
+        "flop_share": float(histogram[:np.searchsorted(LOG_RATIO_EDGES, 0.0, side="right")].sum() / films),
+        "log_std": float(np.sqrt(max(log_squares / films - mean ** 2, 0.0))),
+    }
+
+
+def histogram_quantile(histogram, q):
+    """Quantile of log ratio, interpolated inside the bin; open-ended bins use their edge"""
+    cumulative = np.cumsum(histogram)
+    target = q * cumulative[-1]
+    i = int(np.searchsorted(cumulative, target))
+    if i == 0 or i == len(histogram) - 1:
+        return float(LOG_RATIO_EDGES[min(i, len(LOG_RATIO_EDGES) - 1)])
+    previous = cumulative[i - 1]
+    fraction = (target - previous) / histogram[i] if histogram[i] else 0.0
+    return float(LOG_RATIO_EDGES[i - 1] + fraction * (LOG_RATIO_EDGES[i] - LOG_RATIO_EDGES[i - 1]))
+
+
+@instrumentation.instrumented("cube.refresh")
+def refresh_cube(cube=None, csv_path=DATA_PATH):
+    """cube brought up to date with csv_path, folding in only rows appended since it was built
+
+    Falls back to a full rebuild when the file no longer starts with the
+    rows the cube has seen (it was edited or replaced rather than appended to).
+    """
+    # Only needed when the cube is stale; keeps pyarrow out of a plain load
+    from models.dataset import load_table
+
+    table = load_table(COLUMNS, csv_path)
+    if cube is not None and cube.rows:
+        seen = table.slice(cube.rows - 1, 1).to_pylist() if cube.rows <= table.num_rows else []
+        if not seen or [str(seen[0]["name"]), int(seen[0]["year"])] != cube.last_film:
+            cube = None
+    if cube is None:
+        cube = AggregateCube()
+    return cube.add(table.slice(cube.rows).to_pandas())
+
+
+def load_cube(csv_path=DATA_PATH):
+    """The persisted cube for csv_path, caught up first if the CSV has changed since it was saved"""
+    path = cube_path(csv_path)
+    cube = AggregateCube.load(path) if os.path.exists(path) else None
+    if cube is None or os.path.getmtime(path) < os.path.getmtime(csv_path):
+        cube = refresh_cube(cube, csv_path)
+        cube.save(path)
+    return cube
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    path = cube_path(csv_path)
+    if os.path.exists(path):
+        os.remove(path)
+    cube = load_cube(csv_path)
+    print(f"Aggregated {cube.rows:,} films into {path} ({' x '.join(str(n) for n in cube.log_sum.shape)} cells)")
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import xgboost as xgb
+
+from models import instrumentation
+from models.conformal import DEFAULT_LEVEL, interval_radius
+from models.feature_scaling import FeaturePreprocessor
+from models.files import atomic_write
+from models.prediction_cache import canonical_record
+from models.tree_evaluator import NumpyTreeEnsemble
+
+
+ARTIFACT_ROOT = "artifacts"
+ARTIFACT_FORMAT = 2
+MODEL_FILE = "model.ubj"
+PREPROCESSOR_FILE = "preprocessor.joblib"
+METADATA_FILE = "metadata.json"
+LATEST_FILE = "LATEST"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_artifact(model, preprocessor, metadata, root=ARTIFACT_ROOT, version=None):
+    """Write booster, fitted preprocessor and metadata to root/<version>/
+
+    The booster is stored in XGBoost's native UBJSON format. LATEST is
+    replaced atomically and last, so a reader never sees a half-written
+    version or pointer. The default version is the UTC time to the second,
+    with -2, -3, ... appended when another save took that name; an explicit
+    version that already exists is an error rather than overwritten.
+    """
+    if version is None:
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+        version = timestamp
+        suffix = 1
+        while True:
+            directory = os.path.join(root, version)
+            try:
+                # Creating the directory claims the name, even against another process
+                os.makedirs(directory)
+                break
+            except FileExistsError:
+                suffix += 1
+                version = f"{timestamp}-{suffix}"
+    else:
+        directory = os.path.join(root, version)
+        os.makedirs(directory)
+
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    booster.save_model(os.path.join(directory, MODEL_FILE))
+    preprocessor.save(os.path.join(directory, PREPROCESSOR_FILE))
+
+    metadata = dict(metadata)
+    metadata.update({
+        "version": version,
+        "format": ARTIFACT_FORMAT,
+        "xgboost_version": xgb.__version__,
+        "feature_names": list(preprocessor.feature_names),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    })
+    with open(os.path.join(directory, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    with atomic_write(os.path.join(root, LATEST_FILE)) as temporary_path, open(temporary_path, "w") as f:
+        f.write(version + "\n")
+    return directory
+
+
+def latest_version(root=ARTIFACT_ROOT):
+    with open(os.path.join(root, LATEST_FILE)) as f:
+        return f.read().strip()
+
+
+class ModelArtifact:
+    """A trained revenue model loaded from disk, ready for inference
+
+    predict_gross consults cache (a PredictionCache) when one is given,
+    keyed on the canonical record and the artifact version. Single rows are
+    written into a preallocated per-thread float32 vector. With
+    numpy_trees=True they are scored by a pure-NumPy copy of the booster
+    instead of XGBoost, which avoids XGBoost's fixed per-call overhead.
+    The interval methods add split-conformal bounds from the calibration
+    residuals stored in the metadata at training time.
+    """
+
+    def __init__(self, booster, preprocessor, metadata, cache=None, numpy_trees=False):
+        self.booster = booster
+        self.preprocessor = preprocessor
+        self.metadata = metadata
+        self.version = metadata["version"]
+        self.feature_names = metadata["feature_names"]
+        self.cache = cache
+        self.trees = NumpyTreeEnsemble.from_booster(booster) if numpy_trees else None
+        self._local = threading.local()
+        conformal = metadata.get("conformal")
+        self.residuals = np.asarray(conformal["residuals"]) if conformal else None
+        self._radii = {}
+
+    @instrumentation.instrumented("model.inference")
+    def predict_log_gross(self, features):
+        # Columns are always in feature_names order, which load_artifact checks once
+        return self.booster.inplace_predict(np.asarray(features, dtype=np.float32), validate_features=False)
+
+    @instrumentation.instrumented("model.predict_gross")
+    def predict_gross(self, input_data):
+        """Predicted gross for one input dict"""
+        if self.cache is not None:
+            key = canonical_record(input_data)
+            cached = self.cache.get(key, self.version)
+            if cached is not None:
+                return cached
+
+        row = self._row()
+        self.preprocessor.transform_one(input_data, out=row[0])
+        if self.trees is not None:
+            log_prediction = self.trees.predict_one(row[0])
+        else:
+            log_prediction = float(self.predict_log_gross(row)[0])
+        gross = math.expm1(log_prediction)
+        if self.cache is not None:
+            self.cache.put(key, self.version, gross)
+        return gross
+
+    @instrumentation.instrumented("model.predict_gross_batch")
+    def predict_gross_batch(self, df):
+        """Predicted gross for every row of a DataFrame"""
+        return np.expm1(self.predict_log_gross(self.preprocessor.transform_array(df)))
+
+    def interval_radius(self, level=DEFAULT_LEVEL):
+        """Half-width of the level interval in log1p(gross)"""
+        if self.residuals is None:
+            raise ValueError(f"Model {self.version} has no conformal calibration; retrain it with train.py")
+        radius = self._radii.get(level)
+        if radius is None:
+            radius = self._radii[level] = interval_radius(self.residuals, level)
+        return radius
+
+    def predict_gross_interval(self, input_data, level=DEFAULT_LEVEL):
+        """(predicted gross, low, high) for one input dict; the range covers the actual gross with probability level"""
+        gross = self.predict_gross(input_data)
+        radius = self.interval_radius(level)
+        log_prediction = math.log1p(gross)
+        return gross, max(math.expm1(log_prediction - radius), 0.0), math.expm1(log_prediction + radius)
+
+    @instrumentation.instrumented("model.predict_gross_interval_batch")
+    def predict_gross_interval_batch(self, df, level=DEFAULT_LEVEL):
+        """(predicted gross, low, high) arrays for every row of a DataFrame"""
+        radius = self.interval_radius(level)
+        log_prediction = self.predict_log_gross(self.preprocessor.transform_array(df)).astype(float)
+        return (np.expm1(log_prediction), np.maximum(np.expm1(log_prediction - radius), 0.0),
+                np.expm1(log_prediction + radius))
+
+    def _row(self):
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = self._local.row = np.empty((1, len(self.feature_names)), dtype=np.float32)
+        return row
+
+
+def load_artifact(root=ARTIFACT_ROOT, version=None, cache=None, numpy_trees=False):
+    if version is None:
+        version = latest_version(root)
+    directory = os.path.join(root, version)
+
+    with open(os.path.join(directory, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    if metadata.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported artifact format in {directory}: {metadata.get('format')}")
+
+    booster = xgb.Booster()
+    booster.load_model(os.path.join(directory, MODEL_FILE))
+    preprocessor = FeaturePreprocessor.load(os.path.join(directory, PREPROCESSOR_FILE))
+    if list(preprocessor.feature_names) != metadata["feature_names"]:
+        raise ValueError(f"Feature order in {directory} does not match its preprocessor")
+
+    return ModelArtifact(booster, preprocessor, metadata, cache, numpy_trees)
@@ -0,0 +1,148 @@
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from models import instrumentation
+from models.rule_predictor import (
+    EFFECT_TEXTS,
+    MARKETING_RATIO,
+    RESULT_TYPES,
+    AccurateMoviePredictor,
+    classify_results,
+)
+
+
+INPUT_COLUMNS = ['budget', 'genre', 'rating', 'season', 'has_star', 'is_sequel']
+TRUE_VALUES = {'y', 'yes', 'true', '1', 't'}
+
+_predictor = None
+
+
+def _init_worker(rules):
+    # Every worker scores with the rules the parent built, never its own
+    global _predictor
+    _predictor = AccurateMoviePredictor(rules=rules)
+
+
+def _get_predictor():
+    # One predictor per process, built on first use
+    global _predictor
+    if _predictor is None:
+        _predictor = AccurateMoviePredictor()
+    return _predictor
+
+
+def _as_bool(values):
+    values = pd.Series(values)
+    if values.dtype == bool:
+        return values.to_numpy()
+    return values.astype(str).str.strip().str.lower().isin(TRUE_VALUES).to_numpy()
+
+
+@instrumentation.instrumented("scoring.chunk")
+def score_chunk(chunk, seed, chunk_index):
+    """Score one chunk of films with predict_batch
+
+    Variation comes from a Generator seeded on (seed, chunk_index), so the
+    output does not depend on the number of workers or scheduling order.
+    """
+    predictor = _get_predictor()
+    missing = [column for column in INPUT_COLUMNS if column not in chunk.columns]
+    if missing:
+        raise ValueError(f"Input is missing columns: {', '.join(missing)}")
+
+    films = {
+        'budget': chunk['budget'].to_numpy(dtype=float),
+        'genre': chunk['genre'].to_numpy(),
+        'rating': chunk['rating'].to_numpy(dtype=float),
+        'season': chunk['season'].to_numpy(),
+        'has_star': _as_bool(chunk['has_star']),
+        'is_sequel': _as_bool(chunk['is_sequel']),
+    }
+    rng = np.random.default_rng([seed, chunk_index])
+    variation = rng.normal(1.0, 0.15, size=len(chunk))
+    revenue, effect_codes = predictor.predict_batch(films, variation=variation)
+
+    total_cost = films['budget'] * (1 + MARKETING_RATIO)
+    profit = revenue - total_cost
+
+    result = chunk.drop(columns=INPUT_COLUMNS).copy()
+    result['predicted_revenue'] = revenue
+    result['profit'] = profit
+    result['roi'] = profit / total_cost * 100
+    result['result_type'] = np.asarray(RESULT_TYPES, dtype=object)[classify_results(profit, films['budget'])]
+    for factor, codes in effect_codes.items():
+        if factor == 'genre':
+            texts = predictor.rules.genre_texts
+        else:
+            texts = EFFECT_TEXTS[factor]
+        result[f'effect_{factor}'] = np.asarray(texts, dtype=object)[codes]
+    return result
+
+
+def read_chunks(path, chunksize):
+    if path.endswith(('.jsonl', '.ndjson')):
+        return pd.read_json(path, lines=True, chunksize=chunksize)
+    return pd.read_csv(path, chunksize=chunksize)
+
+
+def format_result(result, jsonl, header):
+    if jsonl:
+        return result.to_json(orient='records', lines=True, double_precision=2)
+    return result.to_csv(header=header, index=False, float_format='%.2f')
+
+
+def score_and_format(chunk, seed, chunk_index, jsonl):
+    # Serializing in the worker keeps the parent process down to plain writes
+    result = score_chunk(chunk, seed, chunk_index)
+    return len(result), format_result(result, jsonl, header=chunk_index == 0)
+
+
+def score_file(input_path, output_path, chunksize=100000, workers=None, seed=42):
+    """Stream input_path through the predictor in chunks and write output_path
+
+    At most 2 * workers chunks are in flight, so memory stays bounded by
+    the chunk size rather than the file size. The rules are built once in
+    this process and handed to every worker. Returns (rows, seconds).
+    """
+    workers = workers or os.cpu_count() or 1
+    # Built (and its dataset caches refreshed) once here, then shipped to the workers
+    rules = _get_predictor().rules
+    jsonl = output_path.endswith(('.jsonl', '.ndjson'))
+    started = time.perf_counter()
+    rows = 0
+    with open(output_path, 'w', newline='') as output:
+        chunks = read_chunks(input_path, chunksize)
+        if workers == 1:
+            for chunk_index, chunk in enumerate(chunks):
+                count, text = score_and_format(chunk, seed, chunk_index, jsonl)
+                output.write(text)
+                rows += count
+        else:
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules,)) as pool:
+                for chunk_index, chunk in enumerate(chunks):
+                    pending.append(pool.submit(score_and_format, chunk, seed, chunk_index, jsonl))
+                    if len(pending) >= 2 * workers:
+                        count, text = pending.popleft().result()
+                        output.write(text)
+                        rows += count
+                while pending:
+                    count, text = pending.popleft().result()
+                    output.write(text)
+                    rows += count
+
+    seconds = time.perf_counter() - started
+    return rows, seconds
+
+
+def main(args):
+    rows, seconds = score_file(args.input, args.output, args.chunksize, args.workers, args.seed)
+    rate = rows / seconds if seconds > 0 else float('inf')
+    print(f"Scored {rows:,} films in {seconds:.1f}s ({rate:,.0f} rows/second) -> {args.output}",
+          file=sys.stderr)
@@ -0,0 +1,145 @@
+import os
+import sys
+
+import joblib
+import numpy as np
+from sklearn.neighbors import KDTree
+
+from models import instrumentation
+from models.files import atomic_write
+from models.dataset import DATA_PATH, load_dataset
+
+
+# How each numeric column enters the distance, before standardizing
+NUMERIC_FEATURES = {
+    "budget": np.log1p,
+    "score": None,
+    "year": None,
+    "runtime": None,
+    "votes": np.log1p,
+}
+# A different genre is as far away as this many standard deviations of one numeric feature
+GENRE_DISTANCE = 1.5
+FILM_COLUMNS = ["name", "year", "genre", "rating", "budget", "gross"]
+
+
+def index_path(csv_path=DATA_PATH):
+    return os.path.splitext(csv_path)[0] + ".comparables.joblib"
+
+
+class ComparableIndex:
+    """KD-tree over the films in the dataset for finding comparable titles
+
+    Films are points of standardized log budget, score, year, runtime and
+    log votes, plus a one-hot genre scaled so that a genre mismatch costs
+    GENRE_DISTANCE. Numeric query columns that are not given (votes for a
+    film that is not out yet, say) or are NaN take their expected value
+    given the columns that are, from the covariance of the dataset films,
+    so a big budget also implies a big audience. Queries are DataFrames or
+    dicts of columns in dataset units (budget in dollars, score on the
+    1-10 scale).
+    """
+
+    def __init__(self, df, leaf_size=40):
+        self.means = {}
+        self.scales = {}
+        for column, transform in NUMERIC_FEATURES.items():
+            values = df[column].to_numpy(dtype=float)
+            values = transform(values) if transform else values
+            self.means[column] = float(np.nanmean(values))
+            self.scales[column] = float(np.nanstd(values)) or 1.0
+        numbers = self._standardize(df)
+        self.covariance = np.cov(numbers[~np.isnan(numbers).any(axis=1)], rowvar=False)
+        self.genres = sorted(df["genre"].astype(str).unique())
+        self.films = {column: df[column].to_numpy() for column in FILM_COLUMNS}
+        self.films["genre"] = self.films["genre"].astype(str)
+        self.tree = KDTree(self.encode(df), leaf_size=leaf_size)
+
+    def encode(self, films):
+        """Points for a DataFrame or dict of equal-length columns"""
+        numbers = self._standardize(films)
+        missing = np.isnan(numbers)
+        # Conditional mean of the missing standardized columns, per pattern of given columns
+        for pattern in np.unique(missing, axis=0):
+            if not pattern.any():
+                continue
+            rows = (missing == pattern).all(axis=1)
+            given = ~pattern
+            if not given.any():
+                numbers[rows] = 0.0
+                continue
+            weights = np.linalg.lstsq(self.covariance[np.ix_(given, given)],
+                                      self.covariance[np.ix_(given, pattern)], rcond=None)[0]
+            numbers[np.ix_(rows, pattern)] = numbers[np.ix_(rows, given)] @ weights
+
+        points = np.zeros((len(numbers), len(NUMERIC_FEATURES) + len(self.genres)))
+        points[:, :len(NUMERIC_FEATURES)] = numbers
+        if "genre" in films:
+            # Genres the dataset has never seen stay all-zero, equally far from every genre
+            genres = np.asarray(films["genre"], dtype=str)
+            codes = np.minimum(np.searchsorted(self.genres, genres), len(self.genres) - 1)
+            known = np.asarray(self.genres)[codes] == genres
+            points[known, len(NUMERIC_FEATURES) + codes[known]] = GENRE_DISTANCE / np.sqrt(2)
+        return points
+
+    def _standardize(self, films):
+        rows = len(next(iter(films.values())) if isinstance(films, dict) else films)
+        numbers = np.full((rows, len(NUMERIC_FEATURES)), np.nan)
+        for i, (column, transform) in enumerate(NUMERIC_FEATURES.items()):
+            if column in films:
+                values = np.asarray(films[column], dtype=float)
+                values = transform(values) if transform else values
+                numbers[:, i] = (values - self.means[column]) / self.scales[column]
+        return numbers
+
+    @instrumentation.instrumented("comparables.query")
+    def query(self, films, k=5):
+        """(distances, indices) of the k nearest dataset films, one row per query"""
+        return self.tree.query(self.encode(films), k=min(k, len(self.films["name"])))
+
+    def similar(self, film, k=5):
+        """The k films most like one film, nearest first, with their budget, gross and ROI"""
+        distances, indices = self.query({column: [value] for column, value in film.items()}, k)
+        return [self.film(index, distance) for index, distance in zip(indices[0], distances[0])]
+
+    def film(self, index, distance=None):
+        budget = float(self.films["budget"][index])
+        gross = float(self.films["gross"][index])
+        return {
+            "name": str(self.films["name"][index]),
+            "year": int(self.films["year"][index]),
+            "genre": self.films["genre"][index],
+            "rating": str(self.films["rating"][index]),
+            "budget": budget,
+            "gross": gross,
+            "profit": gross - budget,
+            "roi": (gross - budget) / budget * 100 if budget else None,
+            "distance": None if distance is None else float(distance),
+        }
+
+    def save(self, path):
+        with atomic_write(path) as temporary_path:
+            joblib.dump(self, temporary_path)
+
+
+@instrumentation.instrumented("comparables.build")
+def build_index(csv_path=DATA_PATH, path=None):
+    path = path or index_path(csv_path)
+    index = ComparableIndex(load_dataset(sorted(set(NUMERIC_FEATURES) | set(FILM_COLUMNS)), csv_path))
+    index.save(path)
+    return index
+
+
+@instrumentation.instrumented("comparables.load")
+def load_index(csv_path=DATA_PATH):
+    """The persisted index for csv_path, rebuilt first if missing or older than the CSV"""
+    path = index_path(csv_path)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(csv_path):
+        return build_index(csv_path, path)
+    return joblib.load(path)
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    index = build_index(csv_path)
+    print(f"Indexed {len(index.films['name']):,} films to {index_path(csv_path)}")
@@ -0,0 +1,134 @@
+import argparse
+import math
+
+import numpy as np
+
+from models import instrumentation
+
+
+# Share of the training rows held out to calibrate the intervals
+CALIBRATION_SHARE = 0.2
+CALIBRATION_SEED = 42
+# Interval levels reported at training time; any level can be asked for at request time
+INTERVAL_LEVELS = (0.5, 0.8, 0.9)
+DEFAULT_LEVEL = 0.8
+
+
+def calibration_rows(rows, share=CALIBRATION_SHARE, seed=CALIBRATION_SEED):
+    """Sorted indices of the rows held out for calibration among the first `rows` rows"""
+    held = np.random.default_rng(seed).permutation(rows)[:int(round(rows * share))]
+    return np.sort(held)
+
+
+def interval_radius(residuals, level):
+    """Split-conformal radius for sorted absolute residuals
+
+    The ceil((n + 1) * level)-th smallest residual covers a new exchangeable
+    row with probability at least level; with too few residuals for that
+    the interval is unbounded.
+    """
+    if not 0 < level < 1:
+        raise ValueError(f"Interval level must be between 0 and 1, got {level}")
+    k = math.ceil((len(residuals) + 1) * level)
+    return float(residuals[k - 1]) if k <= len(residuals) else math.inf
+
+
+def coverage(calibration_residuals, test_residuals, levels=INTERVAL_LEVELS):
+    """Share of test rows inside intervals calibrated on calibration_residuals, per level"""
+    calibration_residuals = np.sort(calibration_residuals)
+    return {
+        str(level): round(float(np.mean(test_residuals <= interval_radius(calibration_residuals, level))), 4)
+        for level in levels
+    }
+
+
+@instrumentation.instrumented("conformal.calibrate")
+def calibrate(model, X, y, rows, share=CALIBRATION_SHARE, seed=CALIBRATION_SEED, levels=INTERVAL_LEVELS):
+    """Conformal metadata from model's residuals on the held-out calibration rows X, y
+
+    Besides the sorted absolute residuals of log1p(gross), records the
+    radius per level and a coverage check: each half of the calibration
+    rows is scored with intervals calibrated on the other half.
+    """
+    residuals = np.abs(np.asarray(y, dtype=float) - np.asarray(model.predict(X), dtype=float))
+    halves = residuals[0::2], residuals[1::2]
+    checks = [coverage(halves[0], halves[1], levels), coverage(halves[1], halves[0], levels)]
+    residuals = np.sort(residuals)
+    return {
+        "method": "split",
+        "share": share,
+        "seed": seed,
+        "rows": int(rows),
+        "calibration_rows": int(len(residuals)),
+        "radius": {str(level): round(interval_radius(residuals, level), 6) for level in levels},
+        "coverage": {level: round((checks[0][level] + checks[1][level]) / 2, 4) for level in checks[0]},
+        "residuals": residuals.round(6).tolist(),
+    }
+
+
+def fit_calibrated(model, X, y, share=CALIBRATION_SHARE, seed=CALIBRATION_SEED, **fit_params):
+    """Fit model on all but the calibration rows of X, y and calibrate it on those
+
+    Returns the conformal metadata for the artifact. With share=0 the model
+    is fit on everything and there are no intervals (returns None).
+    """
+    if not share:
+        model.fit(X, y, **fit_params)
+        return None
+    held = calibration_rows(len(X), share, seed)
+    fit = np.ones(len(X), dtype=bool)
+    fit[held] = False
+    model.fit(X.iloc[fit], y.iloc[fit], **fit_params)
+    return calibrate(model, X.iloc[held], y.iloc[held], len(X), share, seed)
+
+
+def verify_coverage(df, params, test_share=0.2, share=CALIBRATION_SHARE, seed=0, levels=INTERVAL_LEVELS):
+    """Coverage and width of the intervals on a test split kept out of both fitting and calibration"""
+    import xgboost as xgb
+    from models.feature_scaling import FeaturePreprocessor, prepare_features
+
+    test = np.zeros(len(df), dtype=bool)
+    test[np.random.default_rng(seed).permutation(len(df))[:int(round(len(df) * test_share))]] = True
+    train_df, test_df = df[~test].reset_index(drop=True), df[test].reset_index(drop=True)
+
+    preprocessor = FeaturePreprocessor().fit(train_df)
+    X, y = prepare_features(train_df, preprocessor)
+    model = xgb.XGBRegressor(objective="reg:squarederror", random_state=42, **params)
+    conformal = fit_calibrated(model, X, y, share, seed)
+
+    X_test, y_test = prepare_features(test_df, preprocessor)
+    residuals = np.abs(y_test.to_numpy(dtype=float) - model.predict(X_test[X.columns]))
+    return {
+        "test_rows": int(len(test_df)),
+        "calibration_rows": conformal["calibration_rows"],
+        "coverage": coverage(np.asarray(conformal["residuals"]), residuals, levels),
+        # An interval spans gross * exp(-radius) to gross * exp(radius)
+        "width_factor": {level: round(math.exp(2 * radius), 2) for level, radius in conformal["radius"].items()},
+    }
+
+
+def main():
+    from models.dataset import DATA_PATH, load_dataset
+
+    parser = argparse.ArgumentParser(description="Check conformal interval coverage on a held-out test split")
+    parser.add_argument("--data", default=DATA_PATH, help="Dataset CSV")
+    parser.add_argument("--seeds", type=int, default=5, help="Random splits to average over")
+    parser.add_argument("--n-estimators", type=int, default=500)
+    parser.add_argument("--max-depth", type=int, default=3)
+    parser.add_argument("--learning-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    df = load_dataset(csv_path=args.data)
+    params = {"n_estimators": args.n_estimators, "max_depth": args.max_depth, "learning_rate": args.learning_rate}
+    results = [verify_coverage(df, params, seed=seed) for seed in range(args.seeds)]
+    print(f"{results[0]['test_rows']:,} test rows, {results[0]['calibration_rows']:,} calibration rows, "
+          f"{args.seeds} splits")
+    for level in results[0]["coverage"]:
+        observed = [result["coverage"][level] for result in results]
+        widths = [result["width_factor"][level] for result in results]
+        print(f"  {float(level):.0%} intervals: coverage {np.mean(observed):.3f} "
+              f"(min {min(observed):.3f}), high/low {np.mean(widths):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
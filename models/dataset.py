@@ -0,0 +1,106 @@
+import csv
+import os
+import sys
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+
+from models import instrumentation
+from models.files import atomic_write
+
+
+DATA_PATH = "revised_datasets/output.csv"
+
+STRING_COLUMNS = [
+    "name",
+    "rating",
+    "genre",
+    "released",
+    "director",
+    "writer",
+    "star",
+    "country",
+    "company",
+]
+FLOAT_COLUMNS = ["score", "votes", "budget", "gross", "runtime"]
+INT_COLUMNS = ["year"]
+
+
+def cache_path(csv_path=DATA_PATH):
+    return os.path.splitext(csv_path)[0] + ".feather"
+
+
+@instrumentation.instrumented("dataset.convert")
+def convert_dataset(csv_path=DATA_PATH, out_path=None):
+    """Write csv_path as an uncompressed Feather (Arrow IPC) file
+
+    String columns are dictionary-encoded, the numeric columns stored as
+    float32 and year as int16. Leaving the file uncompressed lets
+    load_dataset memory-map it without copying or decoding anything.
+    """
+    out_path = out_path or cache_path(csv_path)
+    table = pa_csv.read_csv(csv_path)
+
+    fields = []
+    for field in table.schema:
+        if field.name in STRING_COLUMNS:
+            fields.append(pa.field(field.name, pa.dictionary(pa.int32(), pa.string())))
+        elif field.name in INT_COLUMNS:
+            fields.append(pa.field(field.name, pa.int16()))
+        elif pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            fields.append(pa.field(field.name, pa.float32()))
+        else:
+            fields.append(field)
+    table = table.cast(pa.schema(fields))
+
+    with atomic_write(out_path) as temporary_path:
+        feather.write_feather(table, temporary_path, compression="uncompressed")
+    return out_path
+
+
+def ensure_dataset(csv_path=DATA_PATH):
+    """Path of the columnar cache for csv_path, rebuilt if missing or stale"""
+    path = cache_path(csv_path)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(csv_path):
+        convert_dataset(csv_path, path)
+    return path
+
+
+@instrumentation.instrumented("dataset.load")
+def load_table(columns=None, csv_path=DATA_PATH):
+    """Memory-mapped Arrow table; only the requested columns are touched"""
+    return feather.read_table(ensure_dataset(csv_path), columns=columns, memory_map=True)
+
+
+def load_dataset(columns=None, csv_path=DATA_PATH):
+    """DataFrame of the requested columns, with categoricals for string columns"""
+    return load_table(columns, csv_path).to_pandas()
+
+
+def append_rows(rows, csv_path=DATA_PATH):
+    """Append the rows of a DataFrame that are not in csv_path yet
+
+    Films are matched on (name, year), so re-running an update with the
+    same file appends nothing. The Feather cache is rebuilt on the next
+    load because the CSV is now newer. Returns the appended rows.
+    """
+    with open(csv_path, newline="") as f:
+        header = next(csv.reader(f))
+    missing = [column for column in header if column not in rows.columns]
+    if missing:
+        raise ValueError(f"New rows are missing columns: {', '.join(missing)}")
+
+    existing = load_dataset(["name", "year"], csv_path)
+    keys = set(zip(existing["name"].astype(str), existing["year"].astype(int)))
+    rows = rows.drop_duplicates(["name", "year"])
+    is_new = [(str(name), int(year)) not in keys for name, year in zip(rows["name"], rows["year"])]
+    rows = rows.loc[is_new, header]
+    if len(rows):
+        rows.to_csv(csv_path, mode="a", header=False, index=False)
+    return rows.reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    print(f"Wrote {convert_dataset(csv_path)}")
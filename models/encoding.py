@@ -0,0 +1,87 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+UNKNOWN = 0
+
+
+def stable_hash(value, buckets):
+    # crc32 is stable across processes, unlike the salted built-in hash()
+    return 1 + zlib.crc32(value.encode("utf-8")) % buckets
+
+
+class CategoricalEncoder:
+    """Frozen string -> integer code mapping for one categorical column
+
+    Code 0 is the unknown bucket: values not seen during fit, values seen
+    fewer than min_frequency times, and missing values all land there.
+    With hash_buckets set, values are hashed into codes 1..hash_buckets
+    instead of being looked up, which keeps near-unique columns (titles,
+    release dates) at a fixed size and never needs a refit.
+    Codes are stored in the smallest integer dtype that fits.
+    """
+
+    def __init__(self, min_frequency=1, hash_buckets=None):
+        self.min_frequency = min_frequency
+        self.hash_buckets = hash_buckets
+        self.vocabulary = None
+        self.categories = None
+
+    @property
+    def n_codes(self):
+        if self.hash_buckets:
+            return self.hash_buckets + 1
+        return len(self.categories) + 1
+
+    @property
+    def dtype(self):
+        for dtype in (np.int8, np.int16, np.int32):
+            if self.n_codes <= np.iinfo(dtype).max:
+                return dtype
+        return np.int64
+
+    def fit(self, values):
+        if self.hash_buckets:
+            self.categories = []
+            self.vocabulary = {}
+            return self
+        # Missing values are always unknown, never part of the vocabulary
+        counts = pd.Series(values).value_counts()
+        counts = counts.groupby(counts.index.astype(str)).sum()
+        kept = sorted(counts[counts >= max(self.min_frequency, 1)].index)
+        self.categories = kept
+        self.vocabulary = {value: code for code, value in enumerate(kept, start=1)}
+        return self
+
+    def encode_one(self, value):
+        """O(1) code for a single value"""
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            return UNKNOWN
+        value = str(value)
+        if self.hash_buckets:
+            return stable_hash(value, self.hash_buckets)
+        return self.vocabulary.get(value, UNKNOWN)
+
+    def transform(self, values):
+        """Codes for a whole column; work is proportional to the distinct values"""
+        values = pd.Series(values)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            uniques = values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values)
+
+        if self.hash_buckets:
+            # Categoricals can carry many unused categories, so only hash the ones present
+            unique_codes = np.full(len(uniques) + 1, UNKNOWN, dtype=self.dtype)
+            present = np.unique(codes[codes >= 0])
+            unique_codes[present] = [stable_hash(str(value), self.hash_buckets) for value in uniques[present]]
+        else:
+            # get_indexer gives -1 for values outside the vocabulary, i.e. UNKNOWN after the shift
+            uniques = pd.Index(uniques).astype(str).astype(object)
+            positions = pd.Index(self.categories, dtype=object).get_indexer(uniques)
+            unique_codes = np.append(positions + 1, UNKNOWN).astype(self.dtype)
+        # factorize and cat.codes mark missing values as -1, which picks the trailing UNKNOWN
+        return unique_codes[codes]
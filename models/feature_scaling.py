@@ -1,92 +1,333 @@
+import joblib
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.impute import SimpleImputer
-
-
-def preprocess_data(df):
-    df = df.copy()
-
-    # Log Transformation
-    if "gross" in df.columns:
-        df["log_gross"] = np.log1p(df["gross"])
-    df["log_budget"] = np.log1p(df["budget"])
-
-    # Feature engineering
-    df["budget_vote_ratio"] = df["budget"] / (df["votes"] + 1)
-    df["budget_runtime_ratio"] = df["budget"] / (df["runtime"] + 1)
-    df["budget_score_ratio"] = df["log_budget"] / (df["score"] + 1)
-    df["vote_score_ratio"] = df["votes"] / (df["score"] + 1)
-    df["budget_year_ratio"] = df["log_budget"] / (df["year"] - df["year"].min() + 1)
-    df["vote_year_ratio"] = df["votes"] / (df["year"] - df["year"].min() + 1)
-    df["score_runtime_ratio"] = df["score"] / (df["runtime"] + 1)
-    df["budget_per_minute"] = df["budget"] / (df["runtime"] + 1)
-    df["votes_per_year"] = df["votes"] / (df["year"] - df["year"].min() + 1)
-    df["is_recent"] = (df["year"] >= df["year"].quantile(0.75)).astype(int)
-    df["is_high_budget"] = (df["log_budget"] >= df["log_budget"].quantile(0.75)).astype(
-        int
-    )
-    df["is_high_votes"] = (df["votes"] >= df["votes"].quantile(0.75)).astype(int)
-    df["is_high_score"] = (df["score"] >= df["score"].quantile(0.75)).astype(int)
-
-    categorical_features = [
-        "released",
-        "writer",
-        "rating",
-        "name",
-        "genre",
-        "director",
-        "star",
-        "country",
-        "company",
-    ]
-
-    for feature in categorical_features:
-        df[feature] = df[feature].astype(str)
-        le = LabelEncoder()
-        df[feature] = le.fit_transform(df[feature])
-
-    numerical_features = [
-        "runtime",
-        "score",
-        "year",
-        "votes",
-        "log_budget",
-        "budget_vote_ratio",
-        "budget_runtime_ratio",
-        "budget_score_ratio",
-        "vote_score_ratio",
-        "budget_year_ratio",
-        "vote_year_ratio",
-        "score_runtime_ratio",
-        "budget_per_minute",
-        "votes_per_year",
-        "is_recent",
-        "is_high_budget",
-        "is_high_votes",
-        "is_high_score",
-    ]
-
-    imputer = SimpleImputer(strategy="median")
-    df[numerical_features] = imputer.fit_transform(df[numerical_features])
-
-    scaler = StandardScaler()
-    df[numerical_features] = scaler.fit_transform(df[numerical_features])
-
-    if "gross" in df.columns:
-        df = df.drop(["gross"], axis=1)
-   # Keep the budget column for prediction!
-
-    return df
-
-def prepare_features(df):
-    processed_df = preprocess_data(df)
-
-    if "log_gross" in processed_df.columns:
-        y = processed_df["log_gross"]
-        X = processed_df.drop("log_gross", axis=1)
-    else:
-        y = None
-        X = processed_df
-
-    return X, y
\ No newline at end of file
+
+from models.encoding import CategoricalEncoder
+from models import instrumentation
+from models.running_stats import RunningStats
+
+
+CATEGORICAL_FEATURES = [
+    "released",
+    "writer",
+    "rating",
+    "name",
+    "genre",
+    "director",
+    "star",
+    "country",
+    "company",
+]
+
+# Near-unique columns are hashed into a fixed number of buckets; everything
+# else keeps a frozen vocabulary with one-off values collapsed into unknown
+CATEGORICAL_ENCODING = {
+    "name": {"hash_buckets": 1024},
+    "released": {"hash_buckets": 1024},
+}
+DEFAULT_ENCODING = {"min_frequency": 2}
+
+NUMERICAL_FEATURES = [
+    "runtime",
+    "score",
+    "year",
+    "votes",
+    "log_budget",
+    "budget_vote_ratio",
+    "budget_runtime_ratio",
+    "budget_score_ratio",
+    "vote_score_ratio",
+    "budget_year_ratio",
+    "vote_year_ratio",
+    "score_runtime_ratio",
+    "budget_per_minute",
+    "votes_per_year",
+    "is_recent",
+    "is_high_budget",
+    "is_high_votes",
+    "is_high_score",
+]
+
+
+# Derived features in output order. An expression is an input column, a
+# fitted parameter ("$name"), a number, another derived feature or
+# (operation, *arguments), evaluated by FeatureEngine.
+YEARS = ("add", ("sub", "year", "$year_min"), 1)
+DERIVED_FEATURES = {
+    "log_budget": ("log1p", "budget"),
+    "budget_vote_ratio": ("div", "budget", ("add", "votes", 1)),
+    "budget_runtime_ratio": ("div", "budget", ("add", "runtime", 1)),
+    "budget_score_ratio": ("div", "log_budget", ("add", "score", 1)),
+    "vote_score_ratio": ("div", "votes", ("add", "score", 1)),
+    "budget_year_ratio": ("div", "log_budget", YEARS),
+    "vote_year_ratio": ("div", "votes", YEARS),
+    "score_runtime_ratio": ("div", "score", ("add", "runtime", 1)),
+    "budget_per_minute": ("div", "budget", ("add", "runtime", 1)),
+    "votes_per_year": ("div", "votes", YEARS),
+    "is_recent": ("ge", "year", "$year_threshold"),
+    "is_high_budget": ("ge", "log_budget", "$log_budget_threshold"),
+    "is_high_votes": ("ge", "votes", "$votes_threshold"),
+    "is_high_score": ("ge", "score", "$score_threshold"),
+}
+# Columns whose 75th percentile becomes the "$<column>_threshold" parameter
+THRESHOLD_COLUMNS = ["year", "log_budget", "votes", "score"]
+
+OPERATIONS = {
+    "add": np.add,
+    "sub": np.subtract,
+    "div": np.divide,
+    "log1p": np.log1p,
+    "ge": lambda a, b: np.greater_equal(a, b).astype(np.float32),
+}
+
+
+class FeatureEngine:
+    """A derived feature spec compiled into a flat program over numbered slots
+
+    Derived features referenced by name are inlined and identical
+    subexpressions share one step, so runtime + 1 or the years since
+    year_min are computed once per call however many features use them.
+    Slots hold the input columns, then the parameters and constants, then
+    one result per step, so evaluation is plain list indexing.
+    """
+
+    def __init__(self, spec=DERIVED_FEATURES):
+        self.inputs = []
+        self.params = []
+        self.constants = []
+        steps = {}
+        outputs = {name: self._compile(expression, spec, steps) for name, expression in spec.items()}
+
+        leaves = self.inputs + ["$" + name for name in self.params] + self.constants
+        slots = {leaf: slot for slot, leaf in enumerate(leaves)}
+        for step in steps:
+            slots[step] = len(slots)
+        self.program = [(step[0], tuple(slots[argument] for argument in step[1:])) for step in steps]
+        self.outputs = {name: slots[expression] for name, expression in outputs.items()}
+
+    def _compile(self, expression, spec, steps):
+        if isinstance(expression, tuple):
+            operation, *arguments = expression
+            step = (operation, *(self._compile(argument, spec, steps) for argument in arguments))
+            steps.setdefault(step, None)
+            return step
+        if isinstance(expression, str) and expression in spec:
+            return self._compile(spec[expression], spec, steps)
+        if isinstance(expression, str) and expression.startswith("$"):
+            names, name = self.params, expression[1:]
+        elif isinstance(expression, str):
+            names, name = self.inputs, expression
+        else:
+            names, name = self.constants, expression
+        if name not in names:
+            names.append(name)
+        return expression
+
+    def evaluate(self, columns, params, operations=OPERATIONS):
+        """Every derived feature from input columns (float32 arrays or scalars) and params"""
+        values = [columns[name] for name in self.inputs] + [params[name] for name in self.params] + self.constants
+        for operation, arguments in self.program:
+            values.append(operations[operation](*[values[slot] for slot in arguments]))
+        return {name: values[slot] for name, slot in self.outputs.items()}
+
+
+ENGINE = FeatureEngine()
+
+
+class FeaturePreprocessor:
+    """Fit-once / transform-many version of preprocess_data
+
+    fit() learns the year offset, the 75th percentile thresholds, the
+    category vocabularies, the imputation medians and the scaler stats from
+    the training frame. transform() and transform_one() only apply them, so
+    a single row at inference is encoded and scaled like the training data.
+    Categorical columns go through models.encoding.CategoricalEncoder, so
+    unseen or rare categories map to the unknown code 0. Derived features
+    come from ENGINE in one pass over float32 columns.
+    running_stats keeps mergeable versions of those statistics, which
+    models/incremental.py updates as new films arrive.
+    """
+
+    def __init__(self):
+        self.year_min = None
+        self.thresholds = None
+        self.encoders = None
+        self.medians = None
+        self.means = None
+        self.scales = None
+        self.feature_names = None
+        self.running_stats = None
+
+    @instrumentation.instrumented("features.fit")
+    def fit(self, df):
+        self._fit(df)
+        return self
+
+    def _fit(self, df):
+        # Returns the engine output so fit_transform does not compute it twice
+        self._plan = None
+        columns = self._columns(df)
+        self.year_min = float(np.nanmin(columns["year"]))
+        quantile_inputs = dict(columns, log_budget=np.log1p(columns["budget"]))
+        quantiles = np.nanquantile(
+            np.column_stack([quantile_inputs[column] for column in THRESHOLD_COLUMNS]).astype(float), 0.75, axis=0
+        )
+        self.thresholds = dict(zip(THRESHOLD_COLUMNS, quantiles.tolist()))
+
+        self.encoders = {}
+        for feature in CATEGORICAL_FEATURES:
+            encoder = CategoricalEncoder(**CATEGORICAL_ENCODING.get(feature, DEFAULT_ENCODING))
+            self.encoders[feature] = encoder.fit(df[feature])
+
+        values = self._values(df, columns)
+        numbers = np.column_stack([values[feature] for feature in NUMERICAL_FEATURES])
+        vocabulary_features = [feature for feature in CATEGORICAL_FEATURES if not self.encoders[feature].hash_buckets]
+        self.running_stats = RunningStats().update(
+            pd.DataFrame(numbers, columns=NUMERICAL_FEATURES, copy=False), df[vocabulary_features]
+        )
+        medians = np.nanmedian(numbers, axis=0)
+        numbers = np.where(np.isnan(numbers), medians, numbers)
+        scales = numbers.std(axis=0, dtype=np.float64)
+        self.medians = dict(zip(NUMERICAL_FEATURES, medians.astype(float).tolist()))
+        self.means = dict(zip(NUMERICAL_FEATURES, numbers.mean(axis=0, dtype=np.float64).tolist()))
+        self.scales = dict(zip(NUMERICAL_FEATURES, np.where(scales > 0, scales, 1.0).tolist()))
+
+        self.feature_names = [column for column in df.columns if column not in ("gross", "log_gross")]
+        self.feature_names += [name for name in DERIVED_FEATURES if name not in self.feature_names]
+        return values
+
+    def transform(self, df):
+        """Float32 features in feature_names order, plus log_gross when df has gross"""
+        return self._frame(df, self.transform_array(df))
+
+    def fit_transform(self, df):
+        values = self._fit(df)
+        return self._frame(df, self.transform_array(df, values))
+
+    @instrumentation.instrumented("features.transform")
+    def transform_array(self, df, values=None):
+        """(rows, features) float32 matrix in feature_names order
+
+        Each column is written once into a preallocated column-major matrix,
+        then imputed and scaled in place.
+        """
+        instrumentation.increment("features.rows", len(df))
+        if values is None:
+            with instrumentation.span("features.engineer"):
+                values = self._values(df)
+
+        features = np.empty((len(df), len(self.feature_names)), dtype=np.float32, order="F")
+        with instrumentation.span("features.encode"):
+            for i, name in enumerate(self.feature_names):
+                if name in self.encoders:
+                    features[:, i] = self.encoders[name].transform(df[name])
+
+        with instrumentation.span("features.scale"):
+            for i, name in enumerate(self.feature_names):
+                if name in self.encoders:
+                    continue
+                column = features[:, i]
+                column[:] = values[name] if name in values else df[name].to_numpy(dtype=np.float32)
+                if name in self.means:
+                    np.copyto(column, np.float32(self.medians[name]), where=np.isnan(column))
+                    column -= np.float32(self.means[name])
+                    column /= np.float32(self.scales[name])
+        return features
+
+    def numerical_frame(self, df):
+        """Unscaled NUMERICAL_FEATURES of df, before imputation"""
+        values = self._values(df)
+        return pd.DataFrame({feature: values[feature] for feature in NUMERICAL_FEATURES}, index=df.index)
+
+    def input_fields(self):
+        """(numeric, categorical) fields transform_one reads from every record"""
+        return list(ENGINE.inputs), list(self.encoders)
+
+    @instrumentation.instrumented("features.transform_one")
+    def transform_one(self, record, out=None):
+        """Transform a single input dict into a float32 vector in feature_names order
+
+        Runs the same float32 operations as transform_array on NumPy scalars,
+        so a row gets bit-identical features (and tree splits) either way.
+        Writes into out, a preallocated float32 vector, when one is given.
+        """
+        params, encoders, scaled, medians, means, scales = self._row_plan()
+        columns = {column: np.float32(record[column]) for column in ENGINE.inputs}
+        derived = ENGINE.evaluate(columns, params)
+        columns.update(derived)
+
+        values = [
+            encoder.encode_one(record[name]) if encoder is not None
+            else columns[name] if name in columns else record.get(name, 0.0)
+            for name, encoder in encoders
+        ]
+        if out is None:
+            out = np.empty(len(values), dtype=np.float32)
+        out[:] = values
+        numbers = out[scaled]
+        np.copyto(numbers, medians, where=np.isnan(numbers))
+        numbers -= means
+        numbers /= scales
+        out[scaled] = numbers
+        return out
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+    def _row_plan(self):
+        # Fitted state in the shape transform_one needs, built once per fit
+        plan = getattr(self, "_plan", None)
+        if plan is None:
+            scaled = [name for name in self.feature_names if name in self.means]
+            plan = self._plan = (
+                {name: np.float32(value) for name, value in self._params().items()},
+                [(name, self.encoders.get(name)) for name in self.feature_names],
+                np.array([self.feature_names.index(name) for name in scaled]),
+                *(np.array([stats[name] for name in scaled], dtype=np.float32)
+                  for stats in (self.medians, self.means, self.scales)),
+            )
+        return plan
+
+    def __getstate__(self):
+        # The row plan is derived from the fitted state, so it is not saved
+        state = dict(self.__dict__)
+        state.pop("_plan", None)
+        return state
+
+    def _params(self):
+        params = {"year_min": self.year_min}
+        params.update({f"{column}_threshold": value for column, value in self.thresholds.items()})
+        return params
+
+    def _columns(self, df):
+        return {column: df[column].to_numpy(dtype=np.float32) for column in ENGINE.inputs}
+
+    def _values(self, df, columns=None):
+        # Input columns plus every derived feature, all float32
+        columns = columns if columns is not None else self._columns(df)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return dict(columns, **ENGINE.evaluate(columns, self._params()))
+
+    def _frame(self, df, features):
+        frame = pd.DataFrame(features, columns=self.feature_names, index=df.index, copy=False)
+        if "gross" in df.columns:
+            frame["log_gross"] = np.log1p(df["gross"].to_numpy(dtype=np.float32))
+        return frame
+
+
+def preprocess_data(df, preprocessor=None):
+    """Fit a new FeaturePreprocessor on df (or apply a fitted one) and transform df"""
+    if preprocessor is None:
+        return FeaturePreprocessor().fit_transform(df)
+    return preprocessor.transform(df)
+
+
+def prepare_features(df, preprocessor=None):
+    X = preprocess_data(df, preprocessor)
+    # pop leaves the float32 feature block in place instead of copying it like drop
+    y = X.pop("log_gross") if "log_gross" in X.columns else None
+    return X, y
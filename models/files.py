@@ -0,0 +1,23 @@
+import contextlib
+import os
+import tempfile
+
+
+@contextlib.contextmanager
+def atomic_write(path):
+    """Yield a fresh temporary path next to path, moved over path when the block succeeds
+
+    Readers never see a partial file, and the name is unique per call, so
+    processes rebuilding the same cache at once never write into each
+    other's temporary file. The temporary file is removed on failure.
+    """
+    directory, name = os.path.split(path)
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory or ".", prefix=name + ".", suffix=".tmp")
+    os.close(descriptor)
+    try:
+        yield temporary_path
+        os.replace(temporary_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temporary_path)
+        raise
@@ -0,0 +1,192 @@
+import copy
+import time
+
+import numpy as np
+import xgboost as xgb
+
+from models import instrumentation
+from models.conformal import CALIBRATION_SEED, CALIBRATION_SHARE, calibrate, calibration_rows, fit_calibrated
+from models.feature_scaling import NUMERICAL_FEATURES, FeaturePreprocessor, prepare_features
+from models.running_stats import RunningStats
+
+
+# Extra boosting rounds per incremental update
+UPDATE_ROUNDS = 50
+# Incremental updates, and rows added as a share of the last full fit, before a scheduled refit
+REFIT_EVERY = 8
+REFIT_GROWTH = 0.25
+# Drift beyond any of these triggers a full refit instead of an incremental update
+DRIFT_LIMITS = {
+    # |running mean - fitted mean| / fitted std, worst numeric feature
+    "mean_shift": 0.2,
+    # |running std / fitted std - 1|, worst numeric feature
+    "std_change": 0.2,
+    # Share of all rows whose category is unknown now but a refit would learn, worst feature
+    "stale_vocabulary": 0.02,
+    # CV R2 at the last full fit minus R2 on the new rows, before updating
+    "r2_drop": 0.15,
+}
+# Below this many new rows their R2 is too noisy to act on
+MIN_R2_ROWS = 30
+
+
+def observe(preprocessor, rows):
+    """Fold rows into the preprocessor's running statistics"""
+    if preprocessor.running_stats is None:
+        preprocessor.running_stats = RunningStats()
+    vocabulary_features = [feature for feature, encoder in preprocessor.encoders.items() if not encoder.hash_buckets]
+    preprocessor.running_stats.update(preprocessor.numerical_frame(rows), rows[vocabulary_features])
+
+
+def _log_r2(artifact, rows):
+    actual = np.log1p(rows["gross"].to_numpy(dtype=float))
+    predicted = np.log1p(artifact.predict_gross_batch(rows.drop(columns=["gross"])))
+    total = ((actual - actual.mean()) ** 2).sum()
+    return float(1 - ((actual - predicted) ** 2).sum() / total) if total else None
+
+
+def _worst(values):
+    feature = max(values, key=values.get)
+    return {"value": round(float(values[feature]), 4), "feature": feature}
+
+
+def drift_report(artifact, preprocessor, df, new_rows):
+    """How far the data has moved from what the applied preprocessing was fitted on
+
+    Mean and std changes compare the running statistics (history plus new
+    rows) with the fitted scaler. Vocabulary staleness is the share of df
+    in the unknown code although its category is now frequent enough for the
+    vocabulary a refit would build, so it grows with every update.
+    """
+    stats = preprocessor.running_stats
+    mean_shift = {
+        feature: abs(stats.mean(feature) - preprocessor.means[feature]) / preprocessor.scales[feature]
+        for feature in NUMERICAL_FEATURES
+    }
+    std_change = {
+        feature: abs(stats.std(feature) / preprocessor.scales[feature] - 1)
+        for feature in NUMERICAL_FEATURES
+    }
+
+    stale_vocabulary = {}
+    new_categories = {}
+    for feature, encoder in preprocessor.encoders.items():
+        if encoder.hash_buckets:
+            continue
+        learnable = set(stats.vocabulary(feature, encoder.min_frequency)) - set(encoder.categories)
+        new_categories[feature] = len(learnable)
+        stale_vocabulary[feature] = float(df[feature].astype(str).isin(learnable).mean())
+
+    # The 75th percentile thresholds a refit would apply, from the quantile sketches
+    thresholds = {
+        name: {"fitted": value, "running": round(stats.quantile(name, 0.75), 4)}
+        for name, value in preprocessor.thresholds.items()
+    }
+
+    r2 = _log_r2(artifact, new_rows) if len(new_rows) >= MIN_R2_ROWS else None
+    cv_r2 = artifact.metadata.get("cv_r2")
+    return {
+        "mean_shift": _worst(mean_shift),
+        "std_change": _worst(std_change),
+        "stale_vocabulary": _worst(stale_vocabulary),
+        "r2_drop": {"value": round(cv_r2 - r2, 4) if r2 is not None and cv_r2 is not None else None,
+                    "new_rows_r2": r2},
+        "new_categories": new_categories,
+        "thresholds": thresholds,
+    }
+
+
+def refit_reasons(drift, metadata, rows_added, refit_every=REFIT_EVERY, limits=DRIFT_LIMITS):
+    reasons = []
+    for name, limit in limits.items():
+        value = drift[name]["value"]
+        if value is not None and value > limit:
+            reasons.append(f"{name} {value:.3f} > {limit}")
+    updates = metadata.get("updates_since_refit", 0) + 1
+    if updates > refit_every:
+        reasons.append(f"{updates} updates since the last full fit")
+    rows_since_refit = metadata.get("rows_since_refit", 0) + rows_added
+    fitted_rows = metadata["training_rows"] - metadata.get("rows_since_refit", 0)
+    if rows_since_refit > REFIT_GROWTH * fitted_rows:
+        reasons.append(f"{rows_since_refit} rows added since the last full fit")
+    return reasons
+
+
+def _xgb_params(metadata, **overrides):
+    return dict(objective="reg:squarederror", random_state=42, **dict(metadata["params"], **overrides))
+
+
+@instrumentation.instrumented("incremental.update")
+def update_model(artifact, df, new_rows, rounds=UPDATE_ROUNDS, refit="auto", refit_every=REFIT_EVERY,
+                 limits=DRIFT_LIMITS):
+    """Fold new_rows, already appended to the end of df, into artifact's model
+
+    An incremental update keeps the fitted preprocessing frozen, since the
+    existing trees split on the scaled features and category codes, and
+    continues boosting for `rounds` more trees on df. The running
+    statistics are updated either way; a full refit (refit="always", or
+    "auto" when drift or the refit schedule calls for it) fits new
+    preprocessing on df and retrains with the artifact's tuned params.
+    Conformal calibration rows stay out of the boosting: an incremental
+    update recalibrates on the same rows, a refit draws a new split.
+    Returns (model, preprocessor, metadata) ready for save_artifact.
+    """
+    started = time.perf_counter()
+    history = df.iloc[:len(df) - len(new_rows)]
+    preprocessor = copy.deepcopy(artifact.preprocessor)
+    if getattr(preprocessor, "running_stats", None) is None:
+        # Artifacts from before running statistics: rebuild them from the history once
+        preprocessor.running_stats = None
+        observe(preprocessor, history)
+    observe(preprocessor, new_rows)
+
+    drift = drift_report(artifact, preprocessor, df, new_rows)
+    reasons = refit_reasons(drift, artifact.metadata, len(new_rows), refit_every, limits)
+    # Models without intervals (older artifacts, or trained without calibration) get them at their next refit
+    previous = artifact.metadata.get("conformal") or {"share": CALIBRATION_SHARE, "seed": CALIBRATION_SEED}
+    if previous.get("rows", 0) > len(df):
+        reasons.append("calibration rows are no longer in the data")
+    if refit == "always":
+        reasons = ["requested"]
+    elif refit == "never":
+        reasons = []
+
+    metadata = {
+        name: value for name, value in artifact.metadata.items()
+        if name not in ("version", "created_at", "feature_names", "format", "xgboost_version")
+    }
+    metadata.update({"parent_version": artifact.version, "rows_added": int(len(new_rows)),
+                     "training_rows": int(len(df)), "drift": drift, "refit_reasons": reasons})
+
+    if reasons:
+        preprocessor = FeaturePreprocessor().fit(df)
+        X, y = prepare_features(df, preprocessor)
+        model = xgb.XGBRegressor(**_xgb_params(artifact.metadata))
+        with instrumentation.span("incremental.refit"):
+            metadata["conformal"] = fit_calibrated(model, X, y, previous["share"], previous["seed"])
+        metadata.update({"update": "refit", "updates_since_refit": 0, "rows_since_refit": 0})
+    else:
+        X, y = prepare_features(df, preprocessor)
+        X = X[artifact.feature_names]
+        model = xgb.XGBRegressor(**_xgb_params(artifact.metadata, n_estimators=rounds))
+        with instrumentation.span("incremental.boost"):
+            if 0 < previous.get("rows", 0) <= len(df):
+                held = calibration_rows(previous["rows"], previous["share"], previous["seed"])
+                fit = np.ones(len(X), dtype=bool)
+                fit[held] = False
+                model.fit(X[fit], y[fit], xgb_model=artifact.booster)
+                metadata["conformal"] = calibrate(model, X.iloc[held], y.iloc[held], previous["rows"],
+                                                  previous["share"], previous["seed"])
+            else:
+                # No calibration rows to rescore: keep the previous calibration until the next refit
+                model.fit(X, y, xgb_model=artifact.booster)
+                metadata["conformal"] = artifact.metadata.get("conformal")
+        metadata.update({
+            "update": "incremental",
+            "updates_since_refit": artifact.metadata.get("updates_since_refit", 0) + 1,
+            "rows_since_refit": artifact.metadata.get("rows_since_refit", 0) + int(len(new_rows)),
+        })
+
+    metadata["trees"] = model.get_booster().num_boosted_rounds()
+    metadata["update_seconds"] = round(time.perf_counter() - started, 2)
+    return model, preprocessor, metadata
@@ -0,0 +1,311 @@
+import atexit
+import functools
+import json
+import multiprocessing
+import os
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+
+
+# Span duration histogram buckets, in seconds
+DURATION_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+METRIC_PREFIX = "movie"
+
+_enabled = False
+_track_memory = False
+_started_tracemalloc = False
+_json_log = None
+_local = threading.local()
+# Threads with an open trace; while 0, a disabled span costs no thread-local lookup
+_tracing = 0
+_tracing_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Registry:
+    """Counters, span duration histograms and span peak memory, shared by all threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.spans = {}
+        self.span_memory = {}
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe_span(self, name, seconds, memory_bytes=None):
+        with self.lock:
+            histogram = self.spans.get(name)
+            if histogram is None:
+                histogram = self.spans[name] = Histogram()
+            histogram.observe(seconds)
+            if memory_bytes is not None:
+                self.span_memory[name] = max(self.span_memory.get(name, 0), memory_bytes)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.spans.clear()
+            self.span_memory.clear()
+
+
+REGISTRY = Registry()
+
+
+class _NullSpan:
+    # Returned by span() while disabled, so a disabled span costs one call and one check
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "started", "memory_start", "child_peak")
+
+    def __init__(self, name):
+        self.name = name
+        self.child_peak = 0
+
+    def __enter__(self):
+        stack = _stack()
+        if _track_memory:
+            # reset_peak is global, so hand the enclosing span its peak so far first
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+            tracemalloc.reset_peak()
+            self.memory_start = current
+        stack.append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.started
+        stack = _stack()
+        stack.pop()
+
+        memory_bytes = None
+        if _track_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            memory_bytes = max(peak - self.memory_start, 0)
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        # A span recorded only for this thread's trace stays out of the shared metrics
+        if _enabled:
+            REGISTRY.observe_span(self.name, seconds, memory_bytes)
+
+        event = {
+            "span": self.name,
+            "parent": stack[-1].name if stack else None,
+            "depth": len(stack),
+            "started": self.started,
+            "ms": seconds * 1000,
+        }
+        if memory_bytes is not None:
+            event["peak_memory_mb"] = memory_bytes / 2**20
+        trace = getattr(_local, "trace", None)
+        if trace is not None:
+            trace.append(event)
+        if _json_log is not None:
+            line = json.dumps(dict(event, time=time.time(), pid=os.getpid()))
+            with REGISTRY.lock:
+                _json_log.write(line + "\n")
+                _json_log.flush()
+        return False
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _recording():
+    return _enabled or (_tracing and getattr(_local, "trace", None) is not None)
+
+
+def span(name):
+    """Context manager timing one named pipeline stage
+
+    A no-op unless spans are enabled or this thread has an open trace.
+    """
+    if not _recording():
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def instrumented(name):
+    """Decorator wrapping every call of a function in span(name)"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _recording():
+                return function(*args, **kwargs)
+            with _Span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def increment(name, value=1):
+    if _enabled:
+        REGISTRY.increment(name, value)
+
+
+def enabled():
+    return _enabled
+
+
+def enable(memory=False, json_log=None):
+    """Start recording spans and counters
+
+    memory=True also records each span's peak traced (Python and NumPy)
+    memory, at a noticeable slowdown. json_log appends every finished span
+    to that file as one JSON line.
+    """
+    global _enabled, _track_memory, _started_tracemalloc, _json_log
+    disable()
+    _track_memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    if json_log:
+        _json_log = open(json_log, "a")
+    _enabled = True
+
+
+def disable():
+    global _enabled, _track_memory, _started_tracemalloc, _json_log
+    _enabled = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    _track_memory = False
+    if _json_log is not None:
+        _json_log.close()
+        _json_log = None
+
+
+def start_trace():
+    """Collect the spans this thread finishes from now on (for one request or rerun)
+
+    Spans are timed for the trace even while disabled, without touching the
+    shared metrics, so one session can trace itself without turning
+    recording on for every other thread.
+    """
+    global _tracing
+    if getattr(_local, "trace", None) is None:
+        with _tracing_lock:
+            _tracing += 1
+    _local.trace = []
+
+
+def finish_trace():
+    """Spans finished since start_trace, in start order so parents precede children"""
+    global _tracing
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        with _tracing_lock:
+            _tracing -= 1
+    _local.trace = None
+    return sorted(trace or [], key=lambda event: event["started"])
+
+
+def snapshot():
+    with REGISTRY.lock:
+        return {
+            "counters": dict(REGISTRY.counters),
+            "spans": {
+                name: {
+                    "count": histogram.count,
+                    "total_ms": histogram.sum * 1000,
+                    "mean_ms": histogram.sum / histogram.count * 1000,
+                    "peak_memory_mb": REGISTRY.span_memory.get(name, 0) / 2**20,
+                }
+                for name, histogram in REGISTRY.spans.items()
+            },
+        }
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def prometheus_text():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    with REGISTRY.lock:
+        for name, value in sorted(REGISTRY.counters.items()):
+            metric = f"{METRIC_PREFIX}_{_metric_name(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+        metric = f"{METRIC_PREFIX}_span_seconds"
+        if REGISTRY.spans:
+            lines.append(f"# TYPE {metric} histogram")
+        for name, histogram in sorted(REGISTRY.spans.items()):
+            cumulative = 0
+            for bucket, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{span="{name}",le="{bucket}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{span="{name}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{metric}_sum{{span="{name}"}} {histogram.sum}')
+            lines.append(f'{metric}_count{{span="{name}"}} {histogram.count}')
+
+        metric = f"{METRIC_PREFIX}_span_peak_memory_bytes"
+        if REGISTRY.span_memory:
+            lines.append(f"# TYPE {metric} gauge")
+        for name, value in sorted(REGISTRY.span_memory.items()):
+            lines.append(f'{metric}{{span="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path):
+    # Write then rename so a scraper never reads a half-written file
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w") as f:
+        f.write(prometheus_text())
+    os.replace(temporary_path, path)
+
+
+def configure_from_env():
+    """Opt in without code changes
+
+    MOVIE_METRICS=1 enables spans, MOVIE_METRICS_MEMORY=1 adds peak memory,
+    MOVIE_METRICS_JSON=<path> appends spans as JSON lines and
+    MOVIE_METRICS_PROM=<path> writes the Prometheus text file at exit.
+    """
+    if os.environ.get("MOVIE_METRICS", "") not in ("1", "true", "yes"):
+        return
+    enable(memory=os.environ.get("MOVIE_METRICS_MEMORY", "") in ("1", "true", "yes"),
+           json_log=os.environ.get("MOVIE_METRICS_JSON"))
+    prometheus_path = os.environ.get("MOVIE_METRICS_PROM")
+    # Worker processes would overwrite the parent's file, so only the main process writes it
+    if prometheus_path and multiprocessing.parent_process() is None:
+        atexit.register(write_prometheus, prometheus_path)
+
+
+configure_from_env()
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Bounded LRU cache with an optional TTL for deterministic predictions
+
+    Entries belong to one model version (the rules fingerprint or the
+    artifact version). A lookup under a different version drops every
+    entry first, so a retrained model or edited rule table never serves
+    stale results. Safe to share between threads (the Streamlit app keeps
+    one per process); every operation runs under one lock.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.version = None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        # Callers hold self._lock
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+                self.entries.clear()
+            self.version = version
+
+    def get(self, key, version):
+        """Cached value for key, or None"""
+        with self._lock:
+            self._check_version(version)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and self.clock() - stored_at > self.ttl:
+                del self.entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._check_version(version)
+            self.entries[key] = (value, self.clock())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "version": self.version,
+            }
+
+
+def _canonical_number(value):
+    # 1 and 1.0 are the same input; round off float noise
+    return round(float(value), 6)
+
+
+def canonical_record(record):
+    """Cache key for one raw record of the trained model"""
+    items = []
+    for name, value in sorted(record.items()):
+        if value is None or isinstance(value, str):
+            items.append((name, value))
+        else:
+            try:
+                items.append((name, _canonical_number(value)))
+            except (TypeError, ValueError):
+                items.append((name, str(value)))
+    return tuple(items)
@@ -0,0 +1,552 @@
+import functools
+import hashlib
+import json
+import os
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from models import instrumentation
+
+
+GENRE_DATA = {
+    'Action': {'multiplier': 1.8, 'risk': 'Medium', 'description': 'Global appeal, good ROI'},
+    'Adventure': {'multiplier': 1.7, 'risk': 'Medium', 'description': 'Family friendly, stable'},
+    'Animation': {'multiplier': 2.0, 'risk': 'Low', 'description': 'Best for families, great ROI'},
+    'Comedy': {'multiplier': 1.3, 'risk': 'High', 'description': 'Domestic focus, mixed results'},
+    'Drama': {'multiplier': 1.1, 'risk': 'Very High', 'description': 'Niche audience, risky'},
+    'Horror': {'multiplier': 2.5, 'risk': 'Very Low', 'description': 'Best ROI, low budget works'},
+    'Romance': {'multiplier': 0.8, 'risk': 'Very High', 'description': 'Limited audience, high risk'},
+    'Sci-Fi': {'multiplier': 1.6, 'risk': 'Medium', 'description': 'Global but expensive'},
+    'Thriller': {'multiplier': 1.2, 'risk': 'Medium', 'description': 'Adult audience, steady'}
+}
+
+# Rating bands: < 5, 5-6, 6-7, 7-8, >= 8
+RATING_BANDS = [5.0, 6.0, 7.0, 8.0]
+RATING_MULTIPLIERS = [0.6, 0.9, 1.3, 2.0, 3.0]
+
+# Season codes: anything that is not Summer or Holiday is off-season
+SEASON_CODES = {'Summer': 1, 'Holiday': 2}
+SEASON_MULTIPLIERS = [0.9, 1.4, 1.3]
+STAR_MULTIPLIERS = [1.0, 1.2]
+SEQUEL_MULTIPLIERS = [1.0, 1.3]
+
+# Genres need this many films in the aggregate cube before their multiplier and risk come from it
+MIN_GENRE_FILMS = 30
+# Risk tier by the share of a genre's films that grossed less than their budget; higher is Very High
+RISK_TIERS = [(0.18, 'Very Low'), (0.25, 'Low'), (0.32, 'Medium'), (0.38, 'High')]
+# Release months per season code; the other known months are off-season
+SEASON_MONTHS = {
+    1: ['May', 'June', 'July', 'August'],
+    2: ['November', 'December'],
+}
+
+# Budget bands: <= 50, 50-100, 100-200, > 200 (thresholds are strict "greater than")
+BUDGET_BANDS = [50, 100, 200]
+# Rating risk bands for the big budget penalty: < 7, 7-7.5, >= 7.5
+RISK_RATING_BANDS = [7.0, 7.5]
+# Budget risk code per [budget band][rating risk band]
+BUDGET_RISK_CODES = [
+    [0, 0, 0],
+    [0, 0, 0],
+    [1, 0, 0],
+    [1, 2, 0],
+]
+BUDGET_RISK_MULTIPLIERS = [1.0, 0.7, 0.6]
+# Romance code per [is romance][budget band]
+ROMANCE_CODES = [
+    [0, 0, 0, 0],
+    [2, 1, 1, 1],
+]
+ROMANCE_MULTIPLIERS = [1.0, 0.6, 1.0]
+
+# Outcome thresholds shared with the result labels in main.py and streamlit_app.py
+MARKETING_RATIO = 0.5
+MINIMUM_RETURN = 0.3
+BLOCKBUSTER_PROFIT_RATIO = 1.5
+FLOP_LOSS_RATIO = 0.3
+
+# Objectives for optimize_budget; risk_adjusted is the pessimistic (P10) profit
+BUDGET_OBJECTIVES = ('profit', 'roi', 'risk_adjusted')
+GOLDEN_RATIO = (np.sqrt(5) - 1) / 2
+
+# Result labels and explanations shown by the CLI, the app and the service, in classify_results code order
+RESULT_TYPES = ["BOX OFFICE FLOP", "BREAK-EVEN", "PROFITABLE", "BLOCKBUSTER HIT"]
+RESULT_MESSAGES = [
+    "High risk of significant losses. Major changes needed.",
+    "Might break even or small loss. Needs careful management.",
+    "Good investment! Should make solid profit.",
+    "Exceptional success! Similar to major Hollywood hits.",
+]
+
+EFFECT_TEXTS = {
+    'rating': [
+        "Very poor quality leads to box office disaster",
+        "Poor quality significantly hurts box office",
+        "Average movies struggle to attract viewers",
+        "Good quality brings steady audience",
+        "Great movies attract more viewers",
+    ],
+    'season': [
+        "Off-season releases have fewer viewers",
+        "Summer releases get more viewers",
+        "Holiday season boosts attendance",
+    ],
+    'star': [
+        "No big stars - needs strong marketing",
+        "Famous actors help but cannot save bad movies",
+    ],
+    'sequel': [
+        "Original movie - needs to build audience",
+        "Sequels have some built-in audience",
+    ],
+    'budget_risk': [
+        "Budget matches quality expectations",
+        "Big budget with average quality = High risk",
+        "Huge budget needs excellent quality to succeed",
+    ],
+    'genre_risk': [
+        "Genre has reasonable box office potential",
+        "Romance genre cannot sustain big budgets",
+        "Romance works best with smaller budgets",
+    ],
+}
+
+
+class CompiledRules:
+    """Rule set compiled into multiplier lookup tables
+
+    base[genre, season, star, sequel] holds the product of those four
+    multipliers and risk[genre, budget band, rating risk band] the product
+    of the big budget and romance penalties, so a prediction is
+    budget * rating multiplier * base * risk * variation.
+    """
+
+    def __init__(self, genre_data, season_multipliers=SEASON_MULTIPLIERS):
+        self.genre_data = genre_data
+        self.season_multipliers = list(season_multipliers)
+        self.genre_names = list(genre_data)
+        self.genre_index = {genre: i for i, genre in enumerate(self.genre_names)}
+        self.genre_texts = [
+            f"{genre} movies typically make {genre_data[genre]['multiplier']}x budget"
+            for genre in self.genre_names
+        ]
+
+        genre_multipliers = np.array([genre_data[g]['multiplier'] for g in self.genre_names])
+        self.rating_bands = np.array(RATING_BANDS)
+        self.rating_multipliers = np.array(RATING_MULTIPLIERS)
+        self.budget_bands = np.array(BUDGET_BANDS, dtype=float)
+        self.risk_rating_bands = np.array(RISK_RATING_BANDS)
+
+        self.base = (
+            genre_multipliers[:, None, None, None]
+            * np.array(self.season_multipliers)[None, :, None, None]
+            * np.array(STAR_MULTIPLIERS)[None, None, :, None]
+            * np.array(SEQUEL_MULTIPLIERS)[None, None, None, :]
+        )
+
+        is_romance = np.array([genre == 'Romance' for genre in self.genre_names], dtype=int)
+        self.budget_risk_codes = np.array(BUDGET_RISK_CODES)
+        self.romance_codes = np.array(ROMANCE_CODES)[is_romance]
+        self.risk = (
+            np.array(BUDGET_RISK_MULTIPLIERS)[self.budget_risk_codes][None, :, :]
+            * np.array(ROMANCE_MULTIPLIERS)[self.romance_codes][:, :, None]
+        )
+
+        # Plain list copies for the scalar path, where numpy indexing overhead dominates
+        self.base_list = self.base.tolist()
+        self.risk_list = self.risk.tolist()
+        self.romance_code_list = self.romance_codes.tolist()
+
+        # Changes whenever any rule table or effect text changes; used as a cache key
+        digest = hashlib.sha256()
+        for table in (self.rating_bands, self.rating_multipliers, self.budget_bands,
+                      self.risk_rating_bands, self.base, self.risk):
+            digest.update(table.tobytes())
+        digest.update(json.dumps([genre_data, EFFECT_TEXTS, SEASON_CODES], sort_keys=True).encode())
+        self.fingerprint = digest.hexdigest()[:16]
+
+    def genre_codes(self, genres):
+        genres = np.asarray(genres)
+        uniques, inverse = np.unique(genres, return_inverse=True)
+        return np.array([self.genre_index[genre] for genre in uniques], dtype=np.intp)[inverse]
+
+
+def rules_from_cube(cube, genre_data=GENRE_DATA, min_films=MIN_GENRE_FILMS):
+    """(genre_data, season multipliers) derived from an AggregateCube
+
+    A genre's multiplier is its median gross / budget and its risk tier
+    comes from the share of its films that lost money. Genres with fewer
+    than min_films films keep their genre_data entry. Season multipliers
+    are each season's median ratio over the median of all dated films.
+    Star and sequel effects are not in the data and stay hardcoded.
+    """
+    derived = {}
+    for genre, entry in genre_data.items():
+        summary = cube.summary(genre=genre)
+        if summary['films'] < min_films:
+            derived[genre] = dict(entry)
+            continue
+        risk = next((tier for limit, tier in RISK_TIERS if summary['flop_share'] < limit), 'Very High')
+        derived[genre] = dict(entry, multiplier=round(summary['median_ratio'], 2), risk=risk)
+
+    dated = [month for month in cube.labels['month'] if month != 'Unknown']
+    off_season = [month for month in dated if not any(month in months for months in SEASON_MONTHS.values())]
+    overall = cube.months_summary(dated)['median_ratio']
+    season_multipliers = list(SEASON_MULTIPLIERS)
+    for code, months in [(0, off_season)] + sorted(SEASON_MONTHS.items()):
+        summary = cube.months_summary(months)
+        if summary['films'] >= min_films:
+            season_multipliers[code] = round(summary['median_ratio'] / overall, 2)
+    return derived, season_multipliers
+
+
+@functools.lru_cache(maxsize=None)
+def default_rules():
+    """Rules derived from the dataset's aggregate cube, loaded once per process
+
+    Falls back to the hardcoded tables only when there is no dataset;
+    failing to build or read the cube is an error, so every predictor in a
+    job uses the same rules.
+    """
+    # Imported here so importing the predictor stays cheap
+    from models.aggregate_cube import DATA_PATH, load_cube
+    if not os.path.exists(DATA_PATH):
+        return CompiledRules(GENRE_DATA)
+    return CompiledRules(*rules_from_cube(load_cube()))
+
+
+def classify_results(profit, budget):
+    """Vectorized RESULT_TYPES code for each film"""
+    profit = np.asarray(profit, dtype=float)
+    budget = np.asarray(budget, dtype=float)
+    return np.select(
+        [profit > budget * BLOCKBUSTER_PROFIT_RATIO, profit > 0, profit > -budget * FLOP_LOSS_RATIO],
+        [3, 2, 1],
+        0,
+    )
+
+
+class AccurateMoviePredictor:
+    """Rule-based revenue predictor
+
+    rules (a CompiledRules) is used as given; otherwise they are compiled
+    from genre_data, or without it come from default_rules(), derived from
+    the dataset. With deterministic=True every prediction uses the median variation
+    (1.0) instead of a random draw and simulate defaults to a fixed seed,
+    so identical inputs give identical results. Only then is cache (a
+    PredictionCache) consulted, keyed on the canonical inputs and the
+    rules fingerprint.
+    """
+
+    def __init__(self, genre_data=None, deterministic=False, cache=None, rules=None):
+        if rules is None:
+            rules = default_rules() if genre_data is None else CompiledRules(genre_data)
+        self.rules = rules
+        self.genre_data = self.rules.genre_data
+        self.effect_texts = EFFECT_TEXTS
+        self.deterministic = deterministic
+        self.cache = cache if deterministic else None
+
+    @instrumentation.instrumented("rules.predict")
+    def predict(self, budget, genre, rating, season, has_star, is_sequel):
+        """ACCURATE prediction based on real industry data"""
+        rules = self.rules
+
+        genre_code = rules.genre_index[genre]
+        season_code = SEASON_CODES.get(season, 0)
+        star_code = 1 if has_star else 0
+        sequel_code = 1 if is_sequel else 0
+
+        if self.cache is not None:
+            # Seasons with the same code predict the same, so they share an entry
+            key = (round(float(budget), 6), genre, round(float(rating), 6), season_code, star_code, sequel_code)
+            cached = self.cache.get(key, rules.fingerprint)
+            if cached is not None:
+                return cached[0], dict(cached[1])
+
+        rating_code = bisect_right(RATING_BANDS, rating)
+        budget_band = bisect_left(BUDGET_BANDS, budget)
+        risk_band = bisect_right(RISK_RATING_BANDS, rating)
+
+        base_revenue = (
+            budget
+            * RATING_MULTIPLIERS[rating_code]
+            * rules.base_list[genre_code][season_code][star_code][sequel_code]
+            * rules.risk_list[genre_code][budget_band][risk_band]
+        )
+
+        # Add realistic variation
+        variation = 1.0 if self.deterministic else np.random.normal(1.0, 0.15)
+        predicted_revenue = base_revenue * variation
+
+        effects = {
+            'rating': EFFECT_TEXTS['rating'][rating_code],
+            'genre': rules.genre_texts[genre_code],
+            'season': EFFECT_TEXTS['season'][season_code],
+            'star': EFFECT_TEXTS['star'][star_code],
+            'sequel': EFFECT_TEXTS['sequel'][sequel_code],
+            'budget_risk': EFFECT_TEXTS['budget_risk'][BUDGET_RISK_CODES[budget_band][risk_band]],
+            'genre_risk': EFFECT_TEXTS['genre_risk'][rules.romance_code_list[genre_code][budget_band]]
+        }
+
+        predicted_revenue = max(predicted_revenue, budget * MINIMUM_RETURN)
+        if self.cache is not None:
+            self.cache.put(key, rules.fingerprint, (predicted_revenue, dict(effects)))
+        return predicted_revenue, effects
+
+    @instrumentation.instrumented("rules.predict_batch")
+    def predict_batch(self, data, variation=None):
+        """Vectorized predict for many films in one pass
+
+        data is a DataFrame (or dict of arrays) with budget, genre, rating,
+        season, has_star and is_sequel columns. Variation is drawn from the
+        global RNG exactly like repeated predict calls unless given (or
+        fixed at 1.0 in deterministic mode).
+        Returns (revenues, effect_codes); see decode_effects.
+        """
+        rules = self.rules
+
+        budget = np.asarray(data['budget'], dtype=float)
+        rating = np.asarray(data['rating'], dtype=float)
+        season = np.asarray(data['season'])
+        star_code = np.asarray(data['has_star'], dtype=bool).astype(np.intp)
+        sequel_code = np.asarray(data['is_sequel'], dtype=bool).astype(np.intp)
+
+        genre_code = rules.genre_codes(data['genre'])
+        rating_code = np.searchsorted(rules.rating_bands, rating, side='right')
+        season_code = np.select([season == "Summer", season == "Holiday"], [1, 2], 0)
+        budget_band = np.searchsorted(rules.budget_bands, budget, side='left')
+        risk_band = np.searchsorted(rules.risk_rating_bands, rating, side='right')
+
+        base_revenue = (
+            budget
+            * rules.rating_multipliers[rating_code]
+            * rules.base[genre_code, season_code, star_code, sequel_code]
+            * rules.risk[genre_code, budget_band, risk_band]
+        )
+
+        if variation is None:
+            if self.deterministic:
+                variation = np.ones(len(budget))
+            else:
+                variation = np.random.normal(1.0, 0.15, size=len(budget))
+        predicted_revenue = base_revenue * variation
+
+        effect_codes = {
+            'rating': rating_code,
+            'genre': genre_code,
+            'season': season_code,
+            'star': star_code,
+            'sequel': sequel_code,
+            'budget_risk': rules.budget_risk_codes[budget_band, risk_band],
+            'genre_risk': rules.romance_codes[genre_code, budget_band],
+        }
+
+        return np.maximum(predicted_revenue, budget * MINIMUM_RETURN), effect_codes
+
+    @instrumentation.instrumented("rules.sweep")
+    def sweep(self, budgets, ratings, genres=None, seasons=("Summer",), has_star=False, is_sequel=False):
+        """Typical outcome over a season x genre x rating x budget grid
+
+        Broadcasts the rule tables over the grid axes in one pass instead of
+        building a row per scenario. Uses the median variation (1.0), so the
+        result is deterministic. Returns revenue, profit and roi arrays of
+        shape (len(seasons), len(genres), len(ratings), len(budgets)).
+        """
+        rules = self.rules
+        genres = list(genres or rules.genre_names)
+
+        budget = np.asarray(budgets, dtype=float)[None, None, None, :]
+        rating = np.asarray(ratings, dtype=float)[None, None, :, None]
+        season_code = np.array([SEASON_CODES.get(season, 0) for season in seasons])[:, None, None, None]
+        genre_code = np.array([rules.genre_index[genre] for genre in genres])[None, :, None, None]
+
+        rating_code = np.searchsorted(rules.rating_bands, rating, side='right')
+        budget_band = np.searchsorted(rules.budget_bands, budget, side='left')
+        risk_band = np.searchsorted(rules.risk_rating_bands, rating, side='right')
+
+        revenue = (
+            budget
+            * rules.rating_multipliers[rating_code]
+            * rules.base[genre_code, season_code, int(has_star), int(is_sequel)]
+            * rules.risk[genre_code, budget_band, risk_band]
+        )
+        revenue = np.maximum(revenue, budget * MINIMUM_RETURN)
+
+        total_cost = budget * (1 + MARKETING_RATIO)
+        profit = revenue - total_cost
+        return {'revenue': revenue, 'profit': profit, 'roi': profit / total_cost * 100}
+
+    @instrumentation.instrumented("rules.simulate")
+    def simulate(self, budget, genre, rating, season, has_star, is_sequel,
+                 n_samples=100000, seed=None, tolerance=0.002):
+        """Monte Carlo revenue distribution for one film
+
+        Draws variation samples on its own np.random.Generator in growing
+        chunks and stops early once P10/P50/P90 move less than tolerance
+        (relative) between chunks. Flop/blockbuster use predict_movie's thresholds.
+        """
+        if n_samples < 1:
+            raise ValueError(f"n_samples must be at least 1, got {n_samples}")
+        if seed is None and self.deterministic:
+            seed = 0
+        rng = np.random.default_rng(seed)
+        film = {
+            'budget': [budget], 'genre': [genre], 'rating': [rating], 'season': [season],
+            'has_star': [has_star], 'is_sequel': [is_sequel],
+        }
+
+        chunks = []
+        drawn = 0
+        chunk_size = min(5000, n_samples)
+        previous = None
+        converged = False
+        while drawn < n_samples:
+            size = min(chunk_size, n_samples - drawn)
+            revenue, effect_codes = self.predict_batch(film, variation=rng.normal(1.0, 0.15, size))
+            chunks.append(revenue)
+            drawn += size
+            chunk_size *= 2
+
+            samples = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+            current = np.percentile(samples, [10, 50, 90])
+            if previous is not None and np.all(np.abs(current - previous) <= tolerance * np.abs(previous)):
+                converged = True
+                break
+            previous = current
+
+        # Profit and ROI are increasing in revenue, so their percentiles follow directly
+        total_cost = budget * (1 + MARKETING_RATIO)
+        profit = samples - total_cost
+        p10, p50, p90 = (float(value) for value in current)
+
+        return {
+            'n_samples': drawn,
+            'converged': converged,
+            'revenue': {'p10': p10, 'p50': p50, 'p90': p90},
+            'profit': {'p10': p10 - total_cost, 'p50': p50 - total_cost, 'p90': p90 - total_cost},
+            'roi': {
+                'p10': (p10 - total_cost) / total_cost * 100,
+                'p50': (p50 - total_cost) / total_cost * 100,
+                'p90': (p90 - total_cost) / total_cost * 100,
+            },
+            'prob_flop': float(np.mean(profit <= -budget * FLOP_LOSS_RATIO)),
+            'prob_blockbuster': float(np.mean(profit > budget * BLOCKBUSTER_PROFIT_RATIO)),
+            'effects': self.decode_effects(effect_codes, 0),
+        }
+
+    def budget_outcomes(self, budgets, genre, rating, season, has_star, is_sequel, variation):
+        """Profit for every budget and variation sample, shape (len(budgets), len(variation))"""
+        rules = self.rules
+        genre_code = rules.genre_index[genre]
+        risk_band = bisect_right(RISK_RATING_BANDS, rating)
+        # Everything but the budget band is fixed, so precompute one multiplier per band
+        band_multipliers = (
+            RATING_MULTIPLIERS[bisect_right(RATING_BANDS, rating)]
+            * rules.base[genre_code, SEASON_CODES.get(season, 0), int(has_star), int(is_sequel)]
+            * rules.risk[genre_code, :, risk_band]
+        )
+
+        budgets = np.asarray(budgets, dtype=float)[:, None]
+        multiplier = band_multipliers[np.searchsorted(rules.budget_bands, budgets, side='left')]
+        revenue = np.maximum(budgets * multiplier * variation[None, :], budgets * MINIMUM_RETURN)
+        return revenue - budgets * (1 + MARKETING_RATIO)
+
+    @instrumentation.instrumented("rules.optimize_budget")
+    def optimize_budget(self, genre, rating, season, has_star, is_sequel, objective='profit',
+                        min_budget=1, max_budget=500, grid_size=200, n_samples=2000,
+                        seed=0, tolerance=0.01):
+        """Budget in [min_budget, max_budget] that maximizes objective for one film
+
+        objective is 'profit' (expected profit), 'roi' (expected ROI) or
+        'risk_adjusted' (P10 profit), all over the same n_samples variation
+        draws so candidates are compared on common random numbers. Candidates
+        are a grid plus both sides of each budget threshold, where revenue
+        jumps; the best is then refined by golden-section search inside its
+        budget band, so the search never straddles a jump. ROI does not
+        change with budget inside a band, so its ties go to the largest
+        budget (the most that can be spent at the best ROI); other ties go
+        to the smallest.
+        """
+        if objective not in BUDGET_OBJECTIVES:
+            raise ValueError(f"Unknown objective {objective!r}, expected one of {BUDGET_OBJECTIVES}")
+
+        variation = np.random.default_rng(seed).normal(1.0, 0.15, n_samples)
+
+        def score(budgets):
+            budgets = np.asarray(budgets, dtype=float)
+            profit = self.budget_outcomes(budgets, genre, rating, season, has_star, is_sequel, variation)
+            if objective == 'profit':
+                return profit.mean(axis=1)
+            if objective == 'roi':
+                return profit.mean(axis=1) / (budgets * (1 + MARKETING_RATIO)) * 100
+            return np.percentile(profit, 10, axis=1)
+
+        # Thresholds are strict "greater than", so t is in the lower band and t + tolerance the upper
+        thresholds = np.array(BUDGET_BANDS, dtype=float)
+        candidates = np.unique(np.concatenate([
+            np.linspace(min_budget, max_budget, grid_size),
+            thresholds,
+            thresholds + tolerance,
+        ]))
+        candidates = candidates[(candidates >= min_budget) & (candidates <= max_budget)]
+        values = score(candidates)
+        evaluations = len(candidates)
+        best = _best_index(values, largest=objective == 'roi')
+
+        # Bracket the best candidate by its grid neighbours, clipped to its budget band
+        band = bisect_left(BUDGET_BANDS, candidates[best])
+        band_low = BUDGET_BANDS[band - 1] + tolerance if band > 0 else min_budget
+        band_high = BUDGET_BANDS[band] if band < len(BUDGET_BANDS) else max_budget
+        low = max(candidates[max(best - 1, 0)], band_low)
+        high = min(candidates[min(best + 1, len(candidates) - 1)], band_high)
+
+        # Golden-section search, two points per step so each step is one vectorized call
+        while high - low > tolerance:
+            step = GOLDEN_RATIO * (high - low)
+            left, right = score([high - step, low + step])
+            evaluations += 2
+            if left >= right:
+                high = low + step
+            else:
+                low = high - step
+        refined = (low + high) / 2
+        refined_value = score([refined])[0]
+        evaluations += 1
+        if refined_value > values[best] + 1e-9 * max(1.0, abs(values[best])):
+            budget = refined
+        else:
+            budget = candidates[best]
+
+        profit = self.budget_outcomes([budget], genre, rating, season, has_star, is_sequel, variation)[0]
+        total_cost = budget * (1 + MARKETING_RATIO)
+        return {
+            'objective': objective,
+            'budget': float(budget),
+            'value': float(score([budget])[0]),
+            'profit': float(profit.mean()),
+            'roi': float(profit.mean() / total_cost * 100),
+            'p10_profit': float(np.percentile(profit, 10)),
+            'evaluations': evaluations,
+            'budgets': candidates,
+            'values': values,
+        }
+
+    def decode_effects(self, effect_codes, index):
+        """Turn one row of predict_batch effect codes into predict's effects dict"""
+        effects = {}
+        for factor, codes in effect_codes.items():
+            code = int(codes[index])
+            if factor == 'genre':
+                effects[factor] = self.rules.genre_texts[code]
+            else:
+                effects[factor] = EFFECT_TEXTS[factor][code]
+        return effects
+
+
+def _best_index(values, largest=False):
+    # Index of the smallest (or largest) budget within rounding of the best value
+    best_value = values.max()
+    ties = np.flatnonzero(values >= best_value - 1e-9 * max(1.0, abs(best_value)))
+    return int(ties[-1] if largest else ties[0])
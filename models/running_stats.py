@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+
+class QuantileSketch:
+    """Mergeable histogram for approximate quantiles of a growing column
+
+    Bin edges are the quantiles of the first batch (of an evenly strided
+    sample of it, for large batches), with open-ended bins below and above,
+    so later batches only add counts.
+    """
+
+    def __init__(self, values, bins=256, sample_size=8192):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        # Linear-interpolated quantiles of the sorted sample, like np.quantile but in one sort
+        sample = np.sort(values[::max(len(values) // sample_size, 1)])
+        positions = np.linspace(0, len(sample) - 1, bins + 1)
+        self.edges = np.unique(np.interp(positions, np.arange(len(sample)), sample)) if len(values) else np.zeros(1)
+        self.counts = np.zeros(len(self.edges) + 1)
+        self.minimum = float(values.min()) if len(values) else 0.0
+        self.maximum = float(values.max()) if len(values) else 0.0
+        self.add(values)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        bins = np.searchsorted(self.edges, values, side="right")
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+    def quantile(self, q):
+        cumulative = np.cumsum(self.counts)
+        target = q * cumulative[-1]
+        i = min(int(np.searchsorted(cumulative, target)), len(self.counts) - 1)
+        lower = self.edges[i - 1] if i > 0 else self.minimum
+        upper = self.edges[i] if i < len(self.edges) else self.maximum
+        previous = cumulative[i - 1] if i > 0 else 0.0
+        fraction = (target - previous) / self.counts[i] if self.counts[i] else 0.0
+        return float(lower + fraction * (upper - lower))
+
+
+class RunningStats:
+    """Per-column statistics that can be updated one batch at a time
+
+    Numeric columns keep count, mean and M2 (merged with Chan's parallel
+    variance formula) plus a QuantileSketch for medians and thresholds;
+    categorical columns keep value counts for the vocabularies.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.counts = {}
+        self.means = {}
+        self.m2 = {}
+        self.sketches = {}
+        self.category_counts = {}
+
+    def update(self, numbers, categories=None):
+        self.rows += len(numbers)
+        for column in numbers.columns:
+            values = numbers[column].to_numpy(dtype=float)
+            values = values[np.isfinite(values)]
+            if column not in self.sketches:
+                self.counts[column], self.means[column], self.m2[column] = 0, 0.0, 0.0
+                self.sketches[column] = QuantileSketch(values)
+            else:
+                self.sketches[column].add(values)
+            if not len(values):
+                continue
+
+            count, mean = len(values), float(values.mean())
+            m2 = float(((values - mean) ** 2).sum())
+            total = self.counts[column] + count
+            delta = mean - self.means[column]
+            self.m2[column] += m2 + delta ** 2 * self.counts[column] * count / total
+            self.means[column] += delta * count / total
+            self.counts[column] = total
+
+        if categories is not None:
+            for column in categories.columns:
+                counts = self.category_counts.setdefault(column, {})
+                # Count first and stringify only the distinct values
+                values = pd.Series(categories[column]).value_counts()
+                values = values[values > 0]
+                for value, count in zip(values.index.astype(str), values.tolist()):
+                    counts[value] = counts.get(value, 0) + count
+        return self
+
+    def mean(self, column):
+        return self.means[column]
+
+    def std(self, column):
+        return float(np.sqrt(self.m2[column] / self.counts[column])) if self.counts[column] else 0.0
+
+    def quantile(self, column, q):
+        return self.sketches[column].quantile(q)
+
+    def vocabulary(self, column, min_frequency=1):
+        """Sorted values seen at least min_frequency times, like CategoricalEncoder.fit"""
+        counts = self.category_counts.get(column, {})
+        return sorted(value for value, count in counts.items() if count >= max(min_frequency, 1))
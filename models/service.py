@@ -0,0 +1,439 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+
+import numpy as np
+
+from models import instrumentation
+from models.conformal import DEFAULT_LEVEL
+from models.prediction_cache import canonical_record
+from models.rule_predictor import (
+    MARKETING_RATIO,
+    RESULT_TYPES,
+    AccurateMoviePredictor,
+    classify_results,
+)
+
+
+MAX_BODY_BYTES = 1 << 20
+STATUS_TEXTS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+# Default load test payloads, one per endpoint
+SAMPLE_REQUESTS = {
+    "/predict": {"budget": 150, "genre": "Action", "rating": 7.2, "season": "Summer",
+                 "has_star": True, "is_sequel": False},
+    "/predict_gross": {"name": "Sample", "rating": "PG-13", "genre": "Action", "released": "June 14, 2019",
+                       "director": "", "writer": "", "star": "", "country": "United States",
+                       "company": "", "runtime": 120.0, "score": 7.0, "budget": 150000000.0,
+                       "year": 2019, "votes": 100000},
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyStats:
+    """Throughput and latency percentiles over the last `window` requests"""
+
+    def __init__(self, window=10000):
+        self.finished = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_items = 0
+
+    def record(self, seconds, ok=True):
+        self.finished.append(time.perf_counter())
+        self.latencies.append(seconds)
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.batched_items += size
+
+    def snapshot(self):
+        stats = {
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+        }
+        stats.update(summarize_latencies(self.latencies, self.finished))
+        return stats
+
+
+def summarize_latencies(latencies, finished):
+    """Throughput and p50/p99/max latency in milliseconds"""
+    if not latencies:
+        return {"throughput_rps": 0.0, "latency_ms": {"p50": 0.0, "p99": 0.0, "max": 0.0}}
+    milliseconds = np.asarray(latencies) * 1000
+    elapsed = finished[-1] - finished[0] if len(finished) > 1 else 0.0
+    p50, p99 = np.percentile(milliseconds, [50, 99])
+    return {
+        "throughput_rps": round(len(finished) / elapsed, 1) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(float(p50), 3),
+            "p99": round(float(p99), 3),
+            "max": round(float(milliseconds.max()), 3),
+        },
+    }
+
+
+class MicroBatcher:
+    """Collect concurrent submissions into one handler(items) call
+
+    The first item of a batch starts a window_ms timer; the batch runs when
+    the timer fires or max_batch items are waiting, whichever comes first.
+    handler returns one result per item, in order; an exception in place of
+    a result fails only that item's submission.
+    """
+
+    def __init__(self, handler, window_ms=2.0, max_batch=512, stats=None):
+        self.handler = handler
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.stats = stats
+        self.pending = []
+        self.timer = None
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((item, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        if self.stats is not None:
+            self.stats.record_batch(len(batch))
+
+        try:
+            with instrumentation.span("service.batch"):
+                results = self.handler([item for item, _ in batch])
+        except Exception as error:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in {"y", "yes", "true", "1", "t"}
+    return bool(value)
+
+
+class PredictionService:
+    """Asyncio HTTP/JSON front end for the rule predictor and the XGBoost model
+
+    POST /predict takes one film (budget, genre, rating, season, has_star,
+    is_sequel, optional seed) and POST /predict_gross one raw record for the
+    trained model. Concurrent requests to either endpoint are micro-batched.
+    Each request draws its variation from its own Generator, seeded from
+    the request when given, so results never depend on what else is in
+    the batch. /predict_gross adds the model's conformal interval when it
+    has one. Model predictions are deterministic, so /predict_gross
+    answers repeated records from cache (a PredictionCache) when given.
+    GET /stats reports throughput, latency and cache counters.
+    """
+
+    def __init__(self, predictor=None, artifact=None, window_ms=2.0, max_batch=512, cache=None):
+        self.predictor = predictor or AccurateMoviePredictor()
+        self.artifact = artifact
+        self.cache = cache
+        self.stats = LatencyStats()
+        self.rule_batcher = MicroBatcher(self.predict_films, window_ms, max_batch, self.stats)
+        self.gross_batcher = MicroBatcher(self.predict_records, window_ms, max_batch, self.stats)
+
+    def parse_film(self, payload):
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Expected a JSON object")
+        try:
+            budget = float(payload["budget"])
+            rating = float(payload["rating"])
+            genre = payload["genre"]
+        except KeyError as error:
+            raise HTTPError(400, f"Missing field: {error.args[0]}")
+        except (TypeError, ValueError):
+            raise HTTPError(400, "budget and rating must be numbers")
+        if not (math.isfinite(budget) and math.isfinite(rating)):
+            raise HTTPError(400, "budget and rating must be finite numbers")
+        if not isinstance(genre, str):
+            raise HTTPError(400, "genre must be a string")
+        if genre not in self.predictor.rules.genre_index:
+            raise HTTPError(400, f"Unknown genre: {genre}")
+        if budget <= 0 or not 1 <= rating <= 10:
+            raise HTTPError(400, "budget must be positive and rating between 1 and 10")
+
+        try:
+            rng = np.random.default_rng(payload.get("seed"))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "seed must be a non-negative integer")
+        return {
+            "budget": budget,
+            "genre": genre,
+            "rating": rating,
+            "season": str(payload.get("season", "Other Season")),
+            "has_star": _as_bool(payload.get("has_star", False)),
+            "is_sequel": _as_bool(payload.get("is_sequel", False)),
+            "variation": rng.normal(1.0, 0.15),
+        }
+
+    def parse_record(self, payload):
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Expected a JSON object")
+        numeric, categorical = self.artifact.preprocessor.input_fields()
+        missing = [field for field in numeric + categorical if field not in payload]
+        if missing:
+            raise HTTPError(400, f"Missing fields: {', '.join(missing)}")
+        record = dict(payload)
+        for field in numeric:
+            # null is allowed and imputed like a missing value in the dataset
+            if record[field] is None:
+                record[field] = float("nan")
+                continue
+            if isinstance(record[field], bool):
+                raise HTTPError(400, f"{field} must be a number")
+            try:
+                record[field] = float(record[field])
+            except (TypeError, ValueError):
+                raise HTTPError(400, f"{field} must be a number")
+            if not math.isfinite(record[field]):
+                raise HTTPError(400, f"{field} must be a finite number")
+        for field in categorical:
+            if isinstance(record[field], (dict, list)):
+                raise HTTPError(400, f"{field} must be a string")
+        return record
+
+    def predict_films(self, films):
+        data = {field: [film[field] for film in films]
+                for field in ("budget", "genre", "rating", "season", "has_star", "is_sequel")}
+        variation = np.array([film["variation"] for film in films])
+        revenue, effect_codes = self.predictor.predict_batch(data, variation=variation)
+
+        budget = np.asarray(data["budget"])
+        total_cost = budget * (1 + MARKETING_RATIO)
+        profit = revenue - total_cost
+        result_codes = classify_results(profit, budget)
+        return [
+            {
+                "predicted_revenue": float(revenue[i]),
+                "profit": float(profit[i]),
+                "roi": float(profit[i] / total_cost[i] * 100),
+                "result_type": RESULT_TYPES[result_codes[i]],
+                "effects": self.predictor.decode_effects(effect_codes, i),
+            }
+            for i in range(len(films))
+        ]
+
+    def predict_records(self, records):
+        # A record that fails gets its own error; the rest of the batch is still scored
+        results = [None] * len(records)
+        if len(records) == 1:
+            # A lone request skips the batch overhead via the single-row path
+            try:
+                log_prediction = np.log1p([self.artifact.predict_gross(records[0])])
+            except Exception as error:
+                return [error]
+            rows = [0]
+        else:
+            rows = []
+            features = []
+            for i, record in enumerate(records):
+                try:
+                    features.append(self.artifact.preprocessor.transform_one(record))
+                    rows.append(i)
+                except Exception as error:
+                    results[i] = error
+            if not rows:
+                return results
+            log_prediction = self.artifact.predict_log_gross(np.stack(features)).astype(float)
+        gross = np.expm1(log_prediction).tolist()
+        if self.artifact.residuals is None:
+            for i, value in zip(rows, gross):
+                results[i] = {"predicted_gross": value, "model_version": self.artifact.version}
+            return results
+
+        # Conformal bounds for the whole batch from one stored radius
+        radius = self.artifact.interval_radius(DEFAULT_LEVEL)
+        low = np.maximum(np.expm1(log_prediction - radius), 0.0).tolist()
+        high = np.expm1(log_prediction + radius).tolist()
+        for j, i in enumerate(rows):
+            results[i] = {"predicted_gross": gross[j],
+                          "interval": {"level": DEFAULT_LEVEL, "low": low[j], "high": high[j]},
+                          "model_version": self.artifact.version}
+        return results
+
+    def snapshot(self):
+        stats = self.stats.snapshot()
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+    async def route(self, method, path, body):
+        if path == "/health":
+            return {"status": "ok", "rules_version": self.predictor.rules.fingerprint,
+                    "model_version": self.artifact.version if self.artifact else None}
+        if path == "/stats":
+            return self.snapshot()
+        if path not in ("/predict", "/predict_gross"):
+            raise HTTPError(404, f"No route for {path}")
+        if method != "POST":
+            raise HTTPError(405, f"{path} expects POST")
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if path == "/predict":
+            return await self.rule_batcher.submit(self.parse_film(payload))
+
+        if self.artifact is None:
+            raise HTTPError(503, "No trained model artifact loaded; run train.py first")
+        record = self.parse_record(payload)
+        if self.cache is None:
+            return await self.gross_batcher.submit(record)
+
+        key = canonical_record(record)
+        result = self.cache.get(key, self.artifact.version)
+        if result is None:
+            result = await self.gross_batcher.submit(record)
+            self.cache.put(key, self.artifact.version, result)
+        return result
+
+    async def handle_connection(self, reader, writer):
+        # HTTP/1.1 with keep-alive; one request at a time per connection
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                started = time.perf_counter()
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "Request body too large"}
+                    body = None
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, payload = 200, await self.route(method, path.split("?", 1)[0], body)
+                    except HTTPError as error:
+                        status, payload = error.status, {"error": str(error)}
+                    except Exception as error:
+                        status, payload = 500, {"error": str(error)}
+
+                keep_alive = headers.get("connection", "").lower() != "close" and body is not None
+                content = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXTS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(content)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + content
+                )
+                await writer.drain()
+                if path not in ("/stats", "/health"):
+                    self.stats.record(time.perf_counter() - started, ok=status == 200)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8000):
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+async def load_test(host, port, n_requests=5000, concurrency=64, path="/predict", payload=None):
+    """Fire n_requests over `concurrency` keep-alive connections; client-side latency stats"""
+    payload = payload or SAMPLE_REQUESTS[path]
+    body = json.dumps(payload).encode()
+    request = (
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    latencies = []
+    finished = []
+    failures = 0
+    remaining = [n_requests]
+
+    async def worker():
+        nonlocal failures
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                started = time.perf_counter()
+                writer.write(request)
+                await writer.drain()
+                status_line = await reader.readline()
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                await reader.readexactly(length)
+                latencies.append(time.perf_counter() - started)
+                finished.append(time.perf_counter())
+                if b" 200 " not in status_line:
+                    failures += 1
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+
+    result = summarize_latencies(latencies, finished)
+    result.update({
+        "requests": len(latencies),
+        "failures": failures,
+        "concurrency": concurrency,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(latencies) / seconds, 1),
+    })
+    return result
@@ -0,0 +1,90 @@
+import time
+
+import xgboost as xgb
+
+from models import instrumentation
+from models.conformal import CALIBRATION_SHARE, fit_calibrated
+from models.dataset import DATA_PATH, load_dataset
+from models.feature_scaling import FeaturePreprocessor, prepare_features
+from models.tuning import grid_search, successive_halving
+
+
+PARAM_GRID = {
+    "n_estimators": [100, 500],
+    "max_depth": [3, 6],
+    "learning_rate": [0.05, 0.1],
+}
+
+
+def load_training_data(path=DATA_PATH):
+    # Reads the memory-mapped columnar cache, rebuilt from the CSV when stale
+    return load_dataset(csv_path=path)
+
+
+@instrumentation.instrumented("training.train_model")
+def train_model(df, param_grid=PARAM_GRID, cv=5, search="grid", budget_seconds=None,
+                tuning_log=None, n_configs=27, calibration_share=CALIBRATION_SHARE):
+    """Tune XGBoost on df and refit the best configuration
+
+    search="grid" runs the exhaustive search over param_grid, on float32
+    fold matrices built once for every config;
+    search="halving" runs the budgeted successive halving search in
+    models/tuning.py, resumable through tuning_log.
+    The refit leaves calibration_share of the rows out and calibrates
+    split-conformal intervals on them (metadata["conformal"]); pass 0 to
+    refit on every row without intervals.
+    Returns (best_model, preprocessor, metadata) ready for save_artifact.
+    """
+    started = time.perf_counter()
+    preprocessor = FeaturePreprocessor().fit(df)
+    X, y = prepare_features(df, preprocessor)
+
+    if search == "halving":
+        with instrumentation.span("training.search"):
+            result = successive_halving(
+                X, y, n_configs=n_configs, cv=cv, budget_seconds=budget_seconds, log_path=tuning_log
+            )
+        best_model = xgb.XGBRegressor(
+            objective="reg:squarederror", random_state=42, **result["params"]
+        )
+        with instrumentation.span("training.refit"):
+            conformal = fit_calibrated(best_model, X, y, calibration_share)
+        metadata = {
+            "search": "halving",
+            "params": result["params"],
+            "cv_folds": cv,
+            "cv_r2": result["cv_r2"],
+            "cv_folds_scored": result["cv_folds_scored"],
+            "cv_scheme": result["cv_scheme"],
+            "configs": result["configs"],
+            "fits": result["fits"],
+            "resumed_fits": result["resumed_fits"],
+            "tuning_seconds": result["tuning_seconds"],
+            "out_of_budget": result["out_of_budget"],
+            "training_rows": int(len(df)),
+            "conformal": conformal,
+            "training_seconds": round(time.perf_counter() - started, 2),
+        }
+        return best_model, preprocessor, metadata
+
+    with instrumentation.span("training.search"):
+        result = grid_search(X, y, param_grid, cv=cv)
+    best_model = xgb.XGBRegressor(
+        objective="reg:squarederror", random_state=42, **result["params"]
+    )
+    with instrumentation.span("training.refit"):
+        conformal = fit_calibrated(best_model, X, y, calibration_share)
+
+    metadata = {
+        "search": "grid",
+        "params": result["params"],
+        "cv_folds": cv,
+        "cv_r2": result["cv_r2"],
+        "configs": result["configs"],
+        "fits": result["fits"],
+        "tuning_seconds": result["tuning_seconds"],
+        "training_rows": int(len(df)),
+        "conformal": conformal,
+        "training_seconds": round(time.perf_counter() - started, 2),
+    }
+    return best_model, preprocessor, metadata
@@ -0,0 +1,102 @@
+import json
+
+import numpy as np
+
+
+# children holds three entries per node: where it sends a value below,
+# at/above its threshold, or missing
+LEFT, RIGHT, MISSING = 0, 1, 2
+
+
+class NumpyTreeEnsemble:
+    """A trained XGBoost regression booster evaluated with NumPy alone
+
+    The trees are exported into flat node arrays (split feature, float32
+    threshold, children, leaf value). Every tree advances one level per
+    step, all at once, so a row costs max_depth rounds of small array
+    operations instead of a call into XGBoost. Leaves point back at
+    themselves, so trees of different depths need no special casing.
+    Splits follow XGBoost: left when value < threshold, and missing values
+    take the node's default direction.
+    """
+
+    def __init__(self, feature, threshold, children, value, roots, depth, base_score):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.base_score = base_score
+
+    @classmethod
+    def from_booster(cls, booster):
+        model = json.loads(booster.save_raw("json"))
+        learner = model["learner"]
+        if learner["objective"]["name"] != "reg:squarederror" or learner["gradient_booster"]["name"] != "gbtree":
+            raise ValueError("Only gbtree boosters with reg:squarederror can be exported")
+        # A one-element list like "[1.72E1]" in recent XGBoost versions
+        base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+
+        features, thresholds, children, values, roots = [], [], [], [], []
+        depth = 0
+        offset = 0
+        for tree in learner["gradient_booster"]["model"]["trees"]:
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits cannot be exported")
+            left = np.asarray(tree["left_children"])
+            right = np.asarray(tree["right_children"])
+            split_conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+            is_leaf = left == -1
+            index = np.arange(len(left)) + offset
+            left = np.where(is_leaf, index, left + offset)
+            right = np.where(is_leaf, index, right + offset)
+            missing = np.where(np.asarray(tree["default_left"], dtype=bool), left, right)
+
+            features.append(np.where(is_leaf, 0, tree["split_indices"]))
+            thresholds.append(np.where(is_leaf, 0, split_conditions))
+            children.append(np.column_stack([left, right, missing]))
+            # Leaves store their output in split_conditions
+            values.append(np.where(is_leaf, split_conditions, 0))
+            roots.append(offset)
+
+            # Children always come after their parent in XGBoost's node order
+            node_depth = np.zeros(len(left), dtype=int)
+            for parent in np.flatnonzero(~is_leaf):
+                node_depth[left[parent] - offset] = node_depth[right[parent] - offset] = node_depth[parent] + 1
+            depth = max(depth, int(node_depth.max()))
+            offset += len(left)
+
+        return cls(
+            np.concatenate(features).astype(np.intp),
+            np.concatenate(thresholds).astype(np.float32),
+            np.concatenate(children).astype(np.intp).ravel(),
+            np.concatenate(values).astype(np.float32),
+            np.array(roots, dtype=np.intp),
+            depth,
+            base_score,
+        )
+
+    def predict_one(self, x):
+        """Raw prediction for one float32 feature vector"""
+        nodes = self.roots
+        if np.isnan(x).any():
+            for _ in range(self.depth):
+                values = x[self.feature[nodes]]
+                branch = (values >= self.threshold[nodes]) + MISSING * np.isnan(values)
+                nodes = self.children[3 * nodes + branch]
+        else:
+            for _ in range(self.depth):
+                nodes = self.children[3 * nodes + (x[self.feature[nodes]] >= self.threshold[nodes])]
+        return float(self.base_score + self.value[nodes].sum(dtype=np.float32))
+
+    def predict(self, X):
+        """Raw predictions for a (rows, features) float32 matrix"""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            values = X[rows, self.feature[nodes]]
+            branch = (values >= self.threshold[nodes]) + MISSING * np.isnan(values)
+            nodes = self.children[3 * nodes + branch]
+        return self.base_score + self.value[nodes].sum(axis=1, dtype=np.float32)
@@ -0,0 +1,274 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import xgboost as xgb
+from sklearn.model_selection import KFold, ParameterGrid
+
+
+# Sampled per trial; learning_rate and reg_lambda on a log scale
+SEARCH_SPACE = {
+    "max_depth": (3, 8),
+    "learning_rate": (0.02, 0.3),
+    "min_child_weight": (1, 10),
+    "subsample": (0.5, 1.0),
+    "colsample_bytree": (0.5, 1.0),
+    "reg_lambda": (0.1, 10.0),
+}
+
+BASE_PARAMS = {"objective": "reg:squarederror", "seed": 42}
+# Share of each training fold successive halving holds out to decide when to
+# stop boosting, so the fold a fit is scored on never picks its round count
+EARLY_STOPPING_SHARE = 0.2
+
+
+def sample_configs(n_configs, seed=42):
+    rng = np.random.default_rng(seed)
+    configs = []
+    for _ in range(n_configs):
+        low, high = SEARCH_SPACE["learning_rate"]
+        lambda_low, lambda_high = SEARCH_SPACE["reg_lambda"]
+        configs.append({
+            "max_depth": int(rng.integers(*SEARCH_SPACE["max_depth"], endpoint=True)),
+            "learning_rate": float(np.exp(rng.uniform(np.log(low), np.log(high)))),
+            "min_child_weight": int(rng.integers(*SEARCH_SPACE["min_child_weight"], endpoint=True)),
+            "subsample": float(rng.uniform(*SEARCH_SPACE["subsample"])),
+            "colsample_bytree": float(rng.uniform(*SEARCH_SPACE["colsample_bytree"])),
+            "reg_lambda": float(np.exp(rng.uniform(np.log(lambda_low), np.log(lambda_high)))),
+        })
+    return configs
+
+
+def config_key(config):
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class TrialLog:
+    """Append-only JSONL log of finished fold fits, keyed on (config, fold)
+
+    Re-running a search with the same log skips every fit already in it,
+    so an interrupted or budget-limited search can be resumed. Fits record
+    the fold scheme they were scored under; fits from another scheme are
+    ignored, since their fold numbers refer to different rows.
+    """
+
+    def __init__(self, path=None, scheme=None):
+        self.path = path
+        self.scheme = scheme
+        self.fits = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        fit = json.loads(line)
+                        if fit.get("scheme") == scheme:
+                            self.fits[(fit["key"], fit["fold"])] = fit
+
+    def get(self, key, fold):
+        return self.fits.get((key, fold))
+
+    def add(self, fit):
+        fit = dict(fit, scheme=self.scheme)
+        self.fits[(fit["key"], fit["fold"])] = fit
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(fit) + "\n")
+
+
+def fit_fold(config, fold, max_rounds=2000, early_stopping_rounds=50):
+    """Out-of-fold R2 and number of useful rounds for one config on one fold
+
+    fold is (dtrain, dstop, dvalid, y_valid): boosting stops early on dstop,
+    split off the training fold, and the result is scored on dvalid.
+    """
+    dtrain, dstop, dvalid, y_valid = fold
+    booster = xgb.train(
+        dict(BASE_PARAMS, **config),
+        dtrain,
+        num_boost_round=max_rounds,
+        evals=[(dstop, "stop")],
+        early_stopping_rounds=early_stopping_rounds,
+        verbose_eval=False,
+    )
+    best_rounds = booster.best_iteration + 1
+    prediction = booster.predict(dvalid, iteration_range=(0, best_rounds))
+    return r2_score(y_valid, prediction), int(best_rounds)
+
+
+def r2_score(y_true, prediction):
+    residual = np.sum((y_true - prediction) ** 2)
+    total = np.sum((y_true - y_true.mean()) ** 2)
+    return float(1 - residual / total)
+
+
+def make_folds(X, y, cv=5, seed=42, shuffle=True, early_stopping_share=None):
+    """Every fold from iter_folds, built once for every config"""
+    return list(iter_folds(X, y, cv, seed, shuffle, early_stopping_share))
+
+
+def iter_folds(X, y, cv=5, seed=42, shuffle=True, early_stopping_share=None):
+    """Yield (dtrain, dvalid, y_valid) one KFold split at a time
+
+    Folds are QuantileDMatrix objects: XGBoost quantizes the float32 rows
+    once and keeps only the compact bin index, and each validation fold
+    reuses its training fold's bins through ref. With early_stopping_share,
+    a seeded random share of each training fold is split off and
+    (dtrain, dstop, dvalid, y_valid) is yielded instead.
+    """
+    X = np.asarray(X, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    splitter = KFold(cv, shuffle=shuffle, random_state=seed if shuffle else None)
+    for train_index, valid_index in splitter.split(X):
+        stop_index = None
+        if early_stopping_share:
+            order = np.random.default_rng(seed).permutation(len(train_index))
+            n_stop = int(round(len(train_index) * early_stopping_share))
+            stop_index = np.sort(train_index[order[:n_stop]])
+            train_index = np.sort(train_index[order[n_stop:]])
+        dtrain = xgb.QuantileDMatrix(X[train_index], label=y[train_index])
+        dvalid = xgb.QuantileDMatrix(X[valid_index], label=y[valid_index], ref=dtrain)
+        if stop_index is None:
+            yield dtrain, dvalid, y[valid_index]
+        else:
+            dstop = xgb.QuantileDMatrix(X[stop_index], label=y[stop_index], ref=dtrain)
+            yield dtrain, dstop, dvalid, y[valid_index]
+
+
+def fold_scheme(cv, early_stopping_share=None):
+    """How successive_halving splits the rows, recorded with its results and trial fits"""
+    scheme = f"KFold({cv}, unshuffled)"
+    if early_stopping_share:
+        scheme += f", early stopping on {early_stopping_share:.0%} of each training fold"
+    return scheme
+
+
+def grid_search(X, y, param_grid, cv=5):
+    """Exhaustive search over param_grid, scored like GridSearchCV(scoring="r2")
+
+    Uses the same unshuffled KFold splits, but each fold is quantized once
+    and shared by every config before the next fold is built, so only one
+    fold is in memory. Configs that differ only in n_estimators share one
+    boosting run per fold, scored at each round count through
+    iteration_range.
+    """
+    started = time.perf_counter()
+    configs = list(ParameterGrid(param_grid))
+
+    groups = {}
+    for config in configs:
+        tree_params = {name: value for name, value in config.items() if name != "n_estimators"}
+        groups.setdefault(config_key(tree_params), (tree_params, []))[1].append(config)
+
+    scores = {config_key(config): [] for config in configs}
+    fits = 0
+    for dtrain, dvalid, y_valid in iter_folds(X, y, cv=cv, shuffle=False):
+        for tree_params, members in groups.values():
+            rounds = {config_key(config): config.get("n_estimators", 100) for config in members}
+            booster = xgb.train(dict(BASE_PARAMS, **tree_params), dtrain, num_boost_round=max(rounds.values()))
+            fits += 1
+            for key, n_rounds in rounds.items():
+                scores[key].append(r2_score(y_valid, booster.predict(dvalid, iteration_range=(0, n_rounds))))
+
+    # max keeps the first of tied configs, like GridSearchCV's rank
+    best = max(configs, key=lambda config: np.mean(scores[config_key(config)]))
+    return {
+        "params": best,
+        "cv_r2": float(np.mean(scores[config_key(best)])),
+        "configs": len(configs),
+        "fits": fits,
+        "tuning_seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def successive_halving(X, y, n_configs=27, eta=3, cv=5, budget_seconds=None,
+                       log_path=None, seed=42, max_rounds=2000, early_stopping_rounds=50,
+                       early_stopping_share=EARLY_STOPPING_SHARE):
+    """Multi-fidelity search over SEARCH_SPACE using CV folds as the fidelity
+
+    Folds are the same unshuffled KFold splits as grid_search, so cv_r2 is
+    comparable between the two. Every fit boosts up to max_rounds with early
+    stopping on early_stopping_share of its training fold and is scored on
+    the validation fold it never saw. Rung k scores the surviving configs on the first eta**k folds
+    (capped at cv), reusing the folds already fitted in earlier rungs, and
+    keeps the best 1/eta, so only a handful of configs pay for full
+    cross-validation. Stops starting new fits once budget_seconds is spent.
+    Returns the best params, with n_estimators from early stopping, and
+    its mean R2 over the most folds any config reached.
+    """
+    started = time.perf_counter()
+    scheme = fold_scheme(cv, early_stopping_share)
+    log = TrialLog(log_path, scheme)
+    folds = make_folds(X, y, cv=cv, seed=seed, shuffle=False, early_stopping_share=early_stopping_share)
+    survivors = sample_configs(n_configs, seed=seed)
+
+    results = {}
+    fits = 0
+    resumed = 0
+    n_folds = 1
+    out_of_budget = False
+    while survivors:
+        rung = []
+        for config in survivors:
+            key = config_key(config)
+            known = results.get(key, {}).get("folds", {})
+            for fold_index in range(n_folds):
+                if fold_index in known:
+                    continue
+                fit = log.get(key, fold_index)
+                if fit is not None:
+                    resumed += 1
+                elif budget_seconds is not None and time.perf_counter() - started > budget_seconds:
+                    out_of_budget = True
+                    break
+                else:
+                    fit_started = time.perf_counter()
+                    score, best_rounds = fit_fold(
+                        config, folds[fold_index], max_rounds, early_stopping_rounds
+                    )
+                    fit = {
+                        "key": key,
+                        "fold": fold_index,
+                        "config": config,
+                        "score": score,
+                        "best_rounds": best_rounds,
+                        "seconds": round(time.perf_counter() - fit_started, 3),
+                    }
+                    log.add(fit)
+                    fits += 1
+                results.setdefault(key, {"config": config, "folds": {}})["folds"][fold_index] = fit
+            if out_of_budget:
+                break
+            rung.append(key)
+
+        if out_of_budget or n_folds >= cv or len(rung) <= 1:
+            break
+        rung.sort(key=lambda key: _mean_score(results[key]), reverse=True)
+        survivors = [results[key]["config"] for key in rung[:max(1, len(rung) // eta)]]
+        n_folds = min(n_folds * eta, cv)
+
+    if not results:
+        raise RuntimeError("Tuning budget ran out before the first fit finished")
+
+    # Only compare configs on the same number of folds
+    most_folds = max(len(result["folds"]) for result in results.values())
+    candidates = [result for result in results.values() if len(result["folds"]) == most_folds]
+    best = max(candidates, key=_mean_score)
+    best_rounds = int(np.median([fit["best_rounds"] for fit in best["folds"].values()]))
+
+    return {
+        "params": dict(best["config"], n_estimators=best_rounds),
+        "cv_r2": _mean_score(best),
+        "cv_folds_scored": most_folds,
+        "cv_scheme": scheme,
+        "configs": len(results),
+        "fits": fits,
+        "resumed_fits": resumed,
+        "tuning_seconds": round(time.perf_counter() - started, 2),
+        "out_of_budget": out_of_budget,
+    }
+
+
+def _mean_score(result):
+    return float(np.mean([fit["score"] for fit in result["folds"].values()]))
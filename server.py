@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import json
+import os
+
+from models.prediction_cache import PredictionCache
+from models.service import PredictionService, load_test
+
+
+# Same default as models.artifacts.ARTIFACT_ROOT, without importing XGBoost to read it
+ARTIFACT_ROOT = "artifacts"
+
+
+def load_model(root, numpy_trees=False):
+    if not os.path.exists(os.path.join(root, "LATEST")):
+        print(f"No model artifact under {root}/ - /predict_gross is disabled until train.py is run")
+        return None
+    # XGBoost and the feature pipeline are only imported when there is a model to load
+    from models.artifacts import load_artifact
+    return load_artifact(root, numpy_trees=numpy_trees)
+
+
+def make_service(args):
+    cache = PredictionCache(maxsize=args.cache_size, ttl=args.cache_ttl) if args.cache_size else None
+    return PredictionService(artifact=load_model(args.artifacts, args.numpy_trees), window_ms=args.window_ms,
+                             max_batch=args.max_batch, cache=cache)
+
+
+async def serve(args):
+    service = make_service(args)
+    server = await service.start(args.host, args.port)
+    print(f"Serving predictions on http://{args.host}:{args.port} (POST /predict, /predict_gross; GET /stats)")
+    async with server:
+        await server.serve_forever()
+
+
+async def benchmark(args):
+    # Server and load generator share one event loop, so numbers are a lower bound
+    service = make_service(args)
+    server = await service.start(args.host, 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        result = await load_test(args.host, port, args.requests, args.concurrency, args.path)
+    result["server"] = service.snapshot()
+    print(json.dumps(result, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON prediction service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--artifacts", default=ARTIFACT_ROOT, help="Artifact root for /predict_gross")
+    parser.add_argument("--numpy-trees", action="store_true",
+                        help="Score single /predict_gross records with the NumPy tree evaluator")
+    parser.add_argument("--window-ms", type=float, default=2.0,
+                        help="How long to collect concurrent requests into one batch")
+    parser.add_argument("--max-batch", type=int, default=512, help="Largest batch per model call")
+    parser.add_argument("--cache-size", type=int, default=4096,
+                        help="Cached /predict_gross results (0 disables the cache)")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="Seconds a cached result stays valid")
+    parser.add_argument("--load-test", action="store_true",
+                        help="Start the service on a free port, load it, and print throughput and latency")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests for --load-test")
+    parser.add_argument("--concurrency", type=int, default=64, help="Connections for --load-test")
+    parser.add_argument("--path", default="/predict", help="Endpoint for --load-test")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(benchmark(args) if args.load_test else serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,33 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import time
 
+from models import instrumentation
+from models.prediction_cache import PredictionCache
+from models.rule_predictor import (
+    BUDGET_OBJECTIVES,
+    MARKETING_RATIO,
+    RESULT_MESSAGES,
+    RESULT_TYPES,
+    AccurateMoviePredictor,
+    classify_results,
+    default_rules,
+)
+
+# Result card colour and emoji, in RESULT_TYPES order
+RESULT_COLORS = ["#ff416c", "#FFA726", "#4ECDC4", "#00b09b"]
+RESULT_EMOJIS = ["📉", "⚖️", "✅", "🎉"]
+
+rerun_started = time.perf_counter()
+
+# The debug panel's checkbox traces this session's reruns only; each rerun runs in its own thread
+record_spans = st.session_state.get('record_spans', False)
+if record_spans:
+    instrumentation.start_trace()
+
 # Page setup
 st.set_page_config(
     page_title="🎬 Movie Success Predictor",
@@ -83,132 +107,63 @@ st.markdown("""
 st.markdown('<div class="main-title">🎬 Movie Success Predictor</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-title">Will your movie be a Blockbuster or Flop? Get clear answers in plain English</div>', unsafe_allow_html=True)
 
-# FIXED Movie Intelligence Engine
-class AccurateMoviePredictor:
-    def __init__(self):
-        self.genre_data = {
-            'Action': {'multiplier': 1.8, 'risk': 'Medium', 'description': 'Global appeal, good ROI'},
-            'Adventure': {'multiplier': 1.7, 'risk': 'Medium', 'description': 'Family friendly, stable'},
-            'Animation': {'multiplier': 2.0, 'risk': 'Low', 'description': 'Best for families, great ROI'},
-            'Comedy': {'multiplier': 1.3, 'risk': 'High', 'description': 'Domestic focus, mixed results'},
-            'Drama': {'multiplier': 1.1, 'risk': 'Very High', 'description': 'Niche audience, risky'},
-            'Horror': {'multiplier': 2.5, 'risk': 'Very Low', 'description': 'Best ROI, low budget works'},
-            'Romance': {'multiplier': 0.8, 'risk': 'Very High', 'description': 'Limited audience, high risk'},  # CHANGED: Lower multiplier
-            'Sci-Fi': {'multiplier': 1.6, 'risk': 'Medium', 'description': 'Global but expensive'},
-            'Thriller': {'multiplier': 1.2, 'risk': 'Medium', 'description': 'Adult audience, steady'}
-        }
-        
-    def predict(self, budget, genre, rating, season, has_star, is_sequel):
-        """ACCURATE prediction based on real industry data"""
-        
-        # Start with budget
-        base_revenue = budget
-        
-        # Apply rating effect (most important!) - FIXED to be more realistic
-        if rating >= 8.0:
-            base_revenue *= 3.0  # Excellent movies
-            rating_effect = "Great movies attract more viewers"
-        elif rating >= 7.0:
-            base_revenue *= 2.0  # Good movies
-            rating_effect = "Good quality brings steady audience"
-        elif rating >= 6.0:
-            base_revenue *= 1.3  # Average movies - REDUCED
-            rating_effect = "Average movies struggle to attract viewers"
-        elif rating >= 5.0:
-            base_revenue *= 0.9  # Below average - NOW NEGATIVE
-            rating_effect = "Poor quality significantly hurts box office"
-        else:
-            base_revenue *= 0.6  # Very poor - SEVERELY NEGATIVE
-            rating_effect = "Very poor quality leads to box office disaster"
-        
-        # Apply genre multiplier
-        genre_multiplier = self.genre_data[genre]['multiplier']
-        base_revenue *= genre_multiplier
-        genre_effect = f"{genre} movies typically make {genre_multiplier}x budget"
-        
-        # Season effect
-        if season == "Summer":
-            base_revenue *= 1.4
-            season_effect = "Summer releases get 40% more viewers"
-        elif season == "Holiday":
-            base_revenue *= 1.3
-            season_effect = "Holiday season boosts attendance"
-        else:
-            base_revenue *= 0.9  # CHANGED: Other seasons have penalty
-            season_effect = "Off-season releases have fewer viewers"
-        
-        # Star power
-        if has_star:
-            base_revenue *= 1.2  # REDUCED star impact
-            star_effect = "Famous actors help but cannot save bad movies"
-        else:
-            base_revenue *= 1.0
-            star_effect = "No big stars - needs strong marketing"
-        
-        # Sequel bonus
-        if is_sequel:
-            base_revenue *= 1.3  # REDUCED sequel impact
-            sequel_effect = "Sequels have some built-in audience"
-        else:
-            base_revenue *= 1.0
-            sequel_effect = "Original movie - needs to build audience"
-        
-        # BIG BUDGET PENALTY - NEW: Big budgets need higher quality
-        if budget > 100 and rating < 7.0:
-            base_revenue *= 0.7  # 30% penalty for big budget + average quality
-            budget_effect = "Big budget with average quality = High risk"
-        elif budget > 200 and rating < 7.5:
-            base_revenue *= 0.6  # 40% penalty for huge budget + mediocre quality
-            budget_effect = "Huge budget needs excellent quality to succeed"
-        else:
-            budget_effect = "Budget matches quality expectations"
-        
-        # ROMANCE GENRE PENALTY - NEW: Romance has limited box office potential
-        if genre == 'Romance' and budget > 50:
-            base_revenue *= 0.6  # 40% penalty for big budget romance
-            romance_effect = "Romance genre cannot sustain big budgets"
-        elif genre == 'Romance':
-            romance_effect = "Romance works best with smaller budgets"
-        else:
-            romance_effect = "Genre has reasonable box office potential"
-        
-        # Add realistic variation
-        variation = np.random.normal(1.0, 0.15)
-        predicted_revenue = base_revenue * variation
-        
-        effects = {
-            'rating': rating_effect,
-            'genre': genre_effect,
-            'season': season_effect,
-            'star': star_effect,
-            'sequel': sequel_effect,
-            'budget_risk': budget_effect,
-            'genre_risk': romance_effect
-        }
-        
-        return max(predicted_revenue, budget * 0.3), effects  # Minimum 30% of budget back
+# Cached across reruns and sessions; the rules fingerprint invalidates it when the tables change
+@st.cache_resource
+def get_predictor(rules_version, deterministic=False):
+    # Shared by all sessions; the cache is only used in deterministic mode
+    return AccurateMoviePredictor(deterministic=deterministic, cache=PredictionCache(maxsize=1024, ttl=3600))
 
-# Initialize accurate predictor
-predictor = AccurateMoviePredictor()
 
 # Real movie examples for comparison - UPDATED with actual flops
-real_movies = {
-    'Blockbusters': [
-        {'name': 'Avatar', 'budget': 237, 'revenue': 2923, 'profit': 2686},
-        {'name': 'Avengers: Endgame', 'budget': 356, 'revenue': 2798, 'profit': 2442},
-        {'name': 'Black Panther', 'budget': 200, 'revenue': 1347, 'profit': 1147}
-    ],
-    'Surprise Hits': [
-        {'name': 'Get Out', 'budget': 4.5, 'revenue': 255, 'profit': 250},
-        {'name': 'Paranormal Activity', 'budget': 0.015, 'revenue': 193, 'profit': 193}
-    ],
-    'Major Flops': [
-        {'name': 'John Carter', 'budget': 263, 'revenue': 284, 'profit': -200},
-        {'name': 'The Lone Ranger', 'budget': 225, 'revenue': 261, 'profit': -150},
-        {'name': 'Radhe Shyam', 'budget': 150, 'revenue': 80, 'profit': -70},  # ADDED
-        {'name': 'Acharya', 'budget': 140, 'revenue': 60, 'profit': -80}       # ADDED
-    ]
-}
+@st.cache_resource
+def get_real_movies():
+    return {
+        'Blockbusters': [
+            {'name': 'Avatar', 'budget': 237, 'revenue': 2923, 'profit': 2686},
+            {'name': 'Avengers: Endgame', 'budget': 356, 'revenue': 2798, 'profit': 2442},
+            {'name': 'Black Panther', 'budget': 200, 'revenue': 1347, 'profit': 1147}
+        ],
+        'Surprise Hits': [
+            {'name': 'Get Out', 'budget': 4.5, 'revenue': 255, 'profit': 250},
+            {'name': 'Paranormal Activity', 'budget': 0.015, 'revenue': 193, 'profit': 193}
+        ],
+        'Major Flops': [
+            {'name': 'John Carter', 'budget': 263, 'revenue': 284, 'profit': -200},
+            {'name': 'The Lone Ranger', 'budget': 225, 'revenue': 261, 'profit': -150},
+            {'name': 'Radhe Shyam', 'budget': 150, 'revenue': 80, 'profit': -70},  # ADDED
+            {'name': 'Acharya', 'budget': 140, 'revenue': 60, 'profit': -80}       # ADDED
+        ]
+    }
+
+
+# Nearest real films from the dataset, loaded once per server
+@st.cache_resource
+def get_comparables():
+    from models.comparables import load_index
+    try:
+        return load_index()
+    except OSError:
+        return None
+
+
+def investment_chart(total_cost, predicted_revenue):
+    categories = ['Money You Spend', 'Money You Make']
+    values = [total_cost, predicted_revenue]
+    fig = go.Figure(go.Bar(
+        x=categories, y=values, marker_color=['#FF6B6B', '#4ECDC4'], opacity=0.8,
+        text=[f'${value:,.0f}M' for value in values], textposition='outside',
+        textfont={'size': 14}, hoverinfo='skip'
+    ))
+    fig.add_hline(y=total_cost, line_dash='dash', line_color='red', opacity=0.7,
+                  annotation_text=f'<b>Break-even: ${total_cost:.0f}M</b>',
+                  annotation_font_color='red', annotation_position='top right')
+    fig.update_layout(title='Investment vs Return', yaxis_title='Millions of Dollars', height=450,
+                      margin={'t': 50}, yaxis_range=[0, max(values) * 1.15], showlegend=False)
+    return fig
+
+
+# Initialize accurate predictor
+real_movies = get_real_movies()
 
 # Sidebar with clear guidance
 with st.sidebar:
@@ -239,6 +194,16 @@ with st.sidebar:
         for movie in real_movies[example][:2]:
             roi = (movie['profit'] / movie['budget']) * 100
             st.write(f"• {movie['name']}: ${movie['profit']}M profit ({roi:.0f}% ROI)")
+    
+    st.markdown("## ⚙️ Settings")
+    deterministic = st.checkbox(
+        "Deterministic predictions",
+        help="Use the typical outcome instead of a random draw, so the same inputs always give the same answer"
+    )
+
+# Derived from the dataset's aggregate cube once per process
+rules = default_rules()
+predictor = get_predictor(rules.fingerprint, deterministic)
 
 # Main input section
 st.markdown("## 🎬 Enter Your Movie Details")
@@ -322,38 +287,27 @@ if budget < 20 and genre == 'Horror' and rating > 7.0:
 if st.button("🎯 Predict My Movie's Success", use_container_width=True, type="primary"):
     
     with st.spinner('Running accurate industry analysis...'):
-        # Get ACCURATE prediction
-        predicted_revenue, effects = predictor.predict(budget, genre, rating, season, has_star, is_sequel)
+        with instrumentation.span("app.predict"):
+            # Get ACCURATE prediction
+            predicted_revenue, effects = predictor.predict(budget, genre, rating, season, has_star, is_sequel)
+            simulation = predictor.simulate(budget, genre, rating, season, has_star, is_sequel)
+            budget_plans = {
+                objective: predictor.optimize_budget(genre, rating, season, has_star, is_sequel, objective)
+                for objective in BUDGET_OBJECTIVES
+            }
         
         # Calculate finances
-        marketing_cost = budget * 0.5
+        marketing_cost = budget * MARKETING_RATIO
         total_cost = budget + marketing_cost
         profit = predicted_revenue - total_cost
         roi = (profit / total_cost) * 100
         
-        # Determine result - MORE ACCURATE thresholds
-        if profit > budget * 1.5:
-            result_type = "BLOCKBUSTER HIT"
-            result_color = "#00b09b"
-            result_emoji = "🎉"
-            result_message = "Exceptional success! Similar to major Hollywood hits."
-        elif profit > 0:
-            result_type = "PROFITABLE"
-            result_color = "#4ECDC4"
-            result_emoji = "✅"
-            result_message = "Good investment! Should make solid profit."
-        elif profit > -budget * 0.3:
-            result_type = "BREAK-EVEN"
-            result_color = "#FFA726"
-            result_emoji = "⚖️"
-            result_message = "Might break even or small loss. Needs careful management."
-        else:
-            result_type = "BOX OFFICE FLOP"
-            result_color = "#ff416c"
-            result_emoji = "📉"
-            result_message = "High risk of significant losses. Major changes needed."
-        
-        time.sleep(1)
+        # Determine result
+        result_code = int(classify_results(profit, budget))
+        result_type = RESULT_TYPES[result_code]
+        result_message = RESULT_MESSAGES[result_code]
+        result_color = RESULT_COLORS[result_code]
+        result_emoji = RESULT_EMOJIS[result_code]
 
     # RESULTS SECTION
     st.markdown("---")
@@ -407,6 +361,24 @@ if st.button("🎯 Predict My Movie's Success", use_container_width=True, type="
         </div>
         """, unsafe_allow_html=True)
     
+    # Spread of simulated outcomes
+    st.markdown("## 🎲 Range of Outcomes")
+    st.caption(f"Based on {simulation['n_samples']:,} simulated releases")
+    
+    range_data = {
+        'Scenario': ['Pessimistic (P10)', 'Typical (P50)', 'Optimistic (P90)'],
+        'Revenue': [f"${simulation['revenue'][p]:,.0f}M" for p in ('p10', 'p50', 'p90')],
+        'Profit': [f"${simulation['profit'][p]:,.0f}M" for p in ('p10', 'p50', 'p90')],
+        'ROI': [f"{simulation['roi'][p]:+.1f}%" for p in ('p10', 'p50', 'p90')]
+    }
+    st.dataframe(pd.DataFrame(range_data), use_container_width=True, hide_index=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Chance of Flop", f"{simulation['prob_flop']:.0%}")
+    with col2:
+        st.metric("Chance of Blockbuster", f"{simulation['prob_blockbuster']:.0%}")
+    
     # Financial breakdown
     st.markdown("## 📈 Financial Breakdown")
     
@@ -423,27 +395,10 @@ if st.button("🎯 Predict My Movie's Success", use_container_width=True, type="
     # Visual chart
     st.markdown("## 📊 Will You Make Money?")
     
-    fig, ax = plt.subplots(figsize=(10, 6))
-    
-    categories = ['Money You Spend', 'Money You Make']
-    values = [total_cost, predicted_revenue]
-    colors = ['#FF6B6B', '#4ECDC4']
-    
-    bars = ax.bar(categories, values, color=colors, alpha=0.8)
-    ax.set_ylabel('Millions of Dollars')
-    ax.set_title('Investment vs Return')
-    
-    for bar, value in zip(bars, values):
-        height = bar.get_height()
-        ax.text(bar.get_x() + bar.get_width()/2, height + 10,
-                f'${value:,.0f}M', ha='center', va='bottom', fontweight='bold', fontsize=12)
-    
-    break_even = total_cost
-    ax.axhline(y=break_even, color='red', linestyle='--', alpha=0.7)
-    ax.text(len(categories)-0.5, break_even + 20, f'Break-even: ${break_even:.0f}M', 
-            color='red', fontweight='bold')
-    
-    st.pyplot(fig)
+    with instrumentation.span("app.chart.investment"):
+        # Plotly renders in the browser: no server-side PNG and no figure left open
+        fig = investment_chart(total_cost, predicted_revenue)
+        st.plotly_chart(fig, use_container_width=True)
     
     # ACCURATE explanation of factors
     st.markdown("## 🔍 Why This Result?")
@@ -489,12 +444,17 @@ if st.button("🎯 Predict My Movie's Success", use_container_width=True, type="
         """, unsafe_allow_html=True)
     
     else:
-        st.markdown("""
+        best = budget_plans['profit']
+        if best['profit'] > 0:
+            budget_advice = f"💰 CHANGE BUDGET to ${best['budget']:,.0f}M (expected profit ${best['profit']:,.0f}M)"
+        else:
+            budget_advice = "💰 NO BUDGET makes this plan profitable - change the factors below"
+        st.markdown(f"""
         <div class="loss-card">
             <h3>🚨 MAJOR CHANGES NEEDED!</h3>
             <p>Your movie will likely lose money. URGENT changes required:</p>
             <ul>
-                <li>💰 REDUCE BUDGET by 40-60% immediately</li>
+                <li>{budget_advice}</li>
                 <li>⭐ IMPROVE QUALITY to 7.5+ rating</li>
                 <li>🎭 CONSIDER GENRE CHANGE to Action/Horror</li>
                 <li>📅 MOVE TO SUMMER release window</li>
@@ -504,10 +464,49 @@ if st.button("🎯 Predict My Movie's Success", use_container_width=True, type="
         </div>
         """, unsafe_allow_html=True)
     
+    # Computed budget recommendations
+    st.markdown("## 🎯 Best Budget for This Movie")
+    st.caption(f"Same genre, rating, season, star and sequel; budgets from $1M to $500M. You chose ${budget}M.")
+    
+    plan_labels = {'profit': 'Most profit', 'roi': 'Best ROI', 'risk_adjusted': 'Safest (best P10 profit)'}
+    plan_data = {
+        'Goal': list(plan_labels.values()),
+        'Budget': [f"${budget_plans[o]['budget']:,.0f}M" for o in plan_labels],
+        'Expected Profit': [f"${budget_plans[o]['profit']:,.0f}M" for o in plan_labels],
+        'ROI': [f"{budget_plans[o]['roi']:+.1f}%" for o in plan_labels],
+        'Pessimistic Profit (P10)': [f"${budget_plans[o]['p10_profit']:,.0f}M" for o in plan_labels]
+    }
+    st.dataframe(pd.DataFrame(plan_data), use_container_width=True, hide_index=True)
+    
+    with instrumentation.span("app.chart.budget_curve"):
+        profit_curve = budget_plans['profit']
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=profit_curve['budgets'], y=profit_curve['values'], mode='lines',
+                                 name='Expected profit', line={'color': '#4ECDC4'}))
+        fig.add_trace(go.Scatter(x=budget_plans['risk_adjusted']['budgets'], y=budget_plans['risk_adjusted']['values'],
+                                 mode='lines', name='Pessimistic profit (P10)', line={'color': '#FF6B6B'}))
+        fig.add_vline(x=budget, line_dash='dash', line_color='gray', annotation_text='Your budget')
+        fig.add_hline(y=0, line_color='black', line_width=1)
+        fig.update_layout(height=400, margin={"t": 30}, xaxis_title="Budget (millions)",
+                          yaxis_title="Profit (millions)", legend={"orientation": "h"})
+        st.plotly_chart(fig, use_container_width=True)
+    
     # ACCURATE movie comparisons
     st.markdown("## 🎬 Real World Comparison")
     
-    if profit < -50:
+    comparables = get_comparables()
+    if comparables is not None:
+        st.write("**Most similar real films (budget, genre, rating):**")
+        similar = comparables.similar({'budget': budget * 1e6, 'genre': genre, 'score': rating})
+        st.dataframe(pd.DataFrame({
+            'Film': [f"{film['name']} ({film['year']})" for film in similar],
+            'Genre': [film['genre'] for film in similar],
+            'Budget': [f"${film['budget'] / 1e6:,.1f}M" for film in similar],
+            'Gross': [f"${film['gross'] / 1e6:,.0f}M" for film in similar],
+            'Profit': [f"${film['profit'] / 1e6:,.0f}M" for film in similar],
+            'ROI': [f"{film['roi']:+.0f}%" for film in similar],
+        }), use_container_width=True, hide_index=True)
+    elif profit < -50:
         st.write("**Similar to MAJOR BOX OFFICE FLOPS:**")
         st.write("• **Radhe Shyam**: Budget $150M, Revenue $80M, Loss $70M (-47% ROI)")
         st.write("• **John Carter**: Budget $263M, Revenue $284M, Loss $200M (-76% ROI)")
@@ -517,6 +516,71 @@ if st.button("🎯 Predict My Movie's Success", use_container_width=True, type="
         st.write("• **Black Panther**: Budget $200M, Profit $1147M (+573% ROI)")
         st.write("• **Get Out**: Budget $4.5M, Profit $250M (+5556% ROI)")
 
+# What-if scenario sweep: the whole budget x rating grid in one vectorized call
+@st.cache_data
+def run_sweep(rules_version, budget_range, rating_range, genres, season, has_star, is_sequel):
+    budgets = np.linspace(budget_range[0], budget_range[1], 200)
+    ratings = np.linspace(rating_range[0], rating_range[1], 100)
+    grid = get_predictor(rules_version).sweep(
+        budgets, ratings, genres=genres, seasons=[season], has_star=has_star, is_sequel=is_sequel
+    )
+    return budgets, ratings, {metric: values[0] for metric, values in grid.items()}
+
+
+def sweep_heatmap(budgets, ratings, values, profit, metric_label, showscale=True):
+    heatmap = go.Heatmap(
+        x=budgets, y=ratings, z=values, colorscale="RdYlGn", zmid=0, showscale=showscale,
+        colorbar={"title": metric_label},
+        hovertemplate="Budget $%{x:.0f}M<br>Rating %{y:.1f}<br>" + metric_label + " %{z:,.0f}<extra></extra>"
+    )
+    break_even = go.Contour(
+        x=budgets, y=ratings, z=profit, showscale=False, hoverinfo="skip",
+        contours={"start": 0, "end": 0, "size": 1, "coloring": "none"},
+        line={"color": "black", "width": 2, "dash": "dash"}
+    )
+    return heatmap, break_even
+
+
+@st.fragment
+def scenario_sweep(genre, season, has_star, is_sequel):
+    st.markdown("## 🔬 What-If Scenarios")
+    st.write("See how profit changes across every budget and quality combination. "
+             "The dashed line is break-even.")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        budget_range = st.slider("Budget range (millions)", 1, 500, (1, 300), key="sweep_budget")
+        metric = st.radio("Show", ["ROI (%)", "Profit ($M)"], horizontal=True, key="sweep_metric")
+    with col2:
+        rating_range = st.slider("Rating range", 1.0, 10.0, (1.0, 10.0), step=0.1, key="sweep_rating")
+        all_genres = st.checkbox("Compare all genres", key="sweep_all_genres")
+    
+    genres = tuple(predictor.genre_data) if all_genres else (genre,)
+    budgets, ratings, grid = run_sweep(
+        rules.fingerprint, budget_range, rating_range, genres, season, has_star, is_sequel
+    )
+    values = grid['roi'] if metric == "ROI (%)" else grid['profit']
+    label = "ROI %" if metric == "ROI (%)" else "Profit $M"
+    
+    with instrumentation.span("app.chart.sweep"):
+        if all_genres:
+            fig = make_subplots(rows=3, cols=3, subplot_titles=genres, shared_xaxes=True, shared_yaxes=True,
+                                horizontal_spacing=0.03, vertical_spacing=0.08)
+            for i, name in enumerate(genres):
+                for trace in sweep_heatmap(budgets, ratings, values[i], grid['profit'][i], label, showscale=i == 0):
+                    fig.add_trace(trace, row=i // 3 + 1, col=i % 3 + 1)
+            fig.update_layout(height=750, margin={"t": 40})
+        else:
+            fig = go.Figure(sweep_heatmap(budgets, ratings, values[0], grid['profit'][0], label))
+            fig.update_layout(height=450, margin={"t": 30}, xaxis_title="Budget (millions)",
+                              yaxis_title="Expected Quality Rating", title=f"{genre} • {season}")
+    
+        st.plotly_chart(fig, use_container_width=True)
+
+
+with st.expander("🔬 What-If Scenarios: sweep budget and rating", expanded=False):
+    scenario_sweep(genre, season, has_star, is_sequel)
+
 # Footer
 st.markdown("---")
 st.markdown(
@@ -524,4 +588,38 @@ st.markdown(
     "ACCURATE Movie Predictions • Real Industry Data • No False Positives"
     "</div>",
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+# Debug panel: wall time of this rerun against the 50 ms budget
+RERUN_BUDGET_MS = 50
+rerun_ms = (time.perf_counter() - rerun_started) * 1000
+rerun_history = st.session_state.setdefault('rerun_ms', [])
+rerun_history.append(rerun_ms)
+del rerun_history[:-100]
+
+with st.sidebar.expander("🛠️ Debug"):
+    st.write(f"This rerun: **{rerun_ms:.1f} ms** (budget {RERUN_BUDGET_MS} ms)")
+    st.write(f"Last {len(rerun_history)} reruns: median {np.median(rerun_history):.1f} ms, "
+             f"max {max(rerun_history):.1f} ms")
+    st.write(f"Rules version: `{rules.fingerprint}`")
+    if predictor.cache is not None:
+        cache_stats = predictor.cache.stats()
+        st.write(f"Prediction cache: {cache_stats['size']}/{cache_stats['maxsize']} entries, "
+                 f"{cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                 f"{cache_stats['evictions']} evictions")
+    st.checkbox("Record spans", key='record_spans', value=False,
+                help="Time each pipeline stage of this rerun, for this session only")
+    if record_spans:
+        spans = instrumentation.finish_trace()
+        if spans:
+            st.dataframe(pd.DataFrame({
+                'Stage': ['\u2003' * span['depth'] + span['span'] for span in spans],
+                'ms': [round(span['ms'], 2) for span in spans]
+            }), hide_index=True)
+        else:
+            st.caption("No spans recorded in this rerun.")
+    if st.button("Clear caches"):
+        st.cache_resource.clear()
+        st.cache_data.clear()
+        default_rules.cache_clear()
+        st.rerun()
@@ -1,136 +1,19 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import xgboost as xgb
-from sklearn.model_selection import GridSearchCV
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.impute import SimpleImputer
 
+from models.artifacts import latest_version, load_artifact
+from models.conformal import DEFAULT_LEVEL
+from models.prediction_cache import PredictionCache
 
-def prepare_features(df):
-    processed_df = preprocess_data(df)
 
-    if "log_gross" in processed_df.columns:
-        y = processed_df["log_gross"]
-        X = processed_df.drop("log_gross", axis=1)
-    else:
-        y = None
-        X = processed_df
-
-    return X, y
-
-
-def preprocess_data(df):
-    df = df.copy()
-
-    # Log Transformation
-    if "gross" in df.columns:
-        df["log_gross"] = np.log1p(df["gross"])
-    df["log_budget"] = np.log1p(df["budget"])
-
-    # Feature engineering
-    df["budget_vote_ratio"] = df["budget"] / (df["votes"] + 1)
-    df["budget_runtime_ratio"] = df["budget"] / (df["runtime"] + 1)
-    df["budget_score_ratio"] = df["log_budget"] / (df["score"] + 1)
-    df["vote_score_ratio"] = df["votes"] / (df["score"] + 1)
-    df["budget_year_ratio"] = df["log_budget"] / (df["year"] - df["year"].min() + 1)
-    df["vote_year_ratio"] = df["votes"] / (df["year"] - df["year"].min() + 1)
-    df["score_runtime_ratio"] = df["score"] / (df["runtime"] + 1)
-    df["budget_per_minute"] = df["budget"] / (df["runtime"] + 1)
-    df["votes_per_year"] = df["votes"] / (df["year"] - df["year"].min() + 1)
-    df["is_recent"] = (df["year"] >= df["year"].quantile(0.75)).astype(int)
-    df["is_high_budget"] = (df["log_budget"] >= df["log_budget"].quantile(0.75)).astype(
-        int
-    )
-    df["is_high_votes"] = (df["votes"] >= df["votes"].quantile(0.75)).astype(int)
-    df["is_high_score"] = (df["score"] >= df["score"].quantile(0.75)).astype(int)
-
-    categorical_features = [
-        "released",
-        "writer",
-        "rating",
-        "name",
-        "genre",
-        "director",
-        "star",
-        "country",
-        "company",
-    ]
-
-    for feature in categorical_features:
-        df[feature] = df[feature].astype(str)
-        le = LabelEncoder()
-        df[feature] = le.fit_transform(df[feature])
-
-    numerical_features = [
-        "runtime",
-        "score",
-        "year",
-        "votes",
-        "log_budget",
-        "budget_vote_ratio",
-        "budget_runtime_ratio",
-        "budget_score_ratio",
-        "vote_score_ratio",
-        "budget_year_ratio",
-        "vote_year_ratio",
-        "score_runtime_ratio",
-        "budget_per_minute",
-        "votes_per_year",
-        "is_recent",
-        "is_high_budget",
-        "is_high_votes",
-        "is_high_score",
-    ]
-
-    imputer = SimpleImputer(strategy="median")
-    df[numerical_features] = imputer.fit_transform(df[numerical_features])
-
-    scaler = StandardScaler()
-    df[numerical_features] = scaler.fit_transform(df[numerical_features])
-
-    if "gross" in df.columns:
-        df = df.drop(["gross", "budget"], axis=1)
-    else:
-        df = df.drop(["budget"], axis=1)
-
-    return df
+@st.cache_resource
+def load_model(version):
+    # Trained offline by train.py; requests only run inference. Keyed on the
+    # version so retraining swaps in the new model and its empty cache
+    return load_artifact(version=version, cache=PredictionCache(maxsize=1024, ttl=3600))
 
 
-def run_model():
-    df = pd.read_csv("revised datasets/output.csv")
-    X, y = prepare_features(df)
-    param_grid = {
-        "n_estimators": [100, 500],
-        "max_depth": [3, 6],
-        "learning_rate": [0.05, 0.1],
-    }
-    grid_search = GridSearchCV(
-        estimator=xgb.XGBRegressor(objective="reg:squarederror", random_state=42),
-        param_grid=param_grid,
-        cv=5,
-        scoring="r2",
-        n_jobs=-1,
-    )
-    grid_search.fit(X, y)
-    best_params = grid_search.best_params_
-    best_model = xgb.XGBRegressor(
-        objective="reg:squarederror", random_state=42, **best_params
-    )
-    best_model.fit(X, y)
-    return best_model
-
-
-def predict_gross(input_data, best_model):
-    processed_data = preprocess_data(pd.DataFrame([input_data]))
-    expected_features = best_model.feature_names_in_
-    for feature in expected_features:
-        if feature not in processed_data.columns:
-            processed_data[feature] = 0
-    processed_data = processed_data[expected_features]
-    log_prediction = best_model.predict(processed_data)
-    prediction = np.exp(log_prediction) - 1
-    return prediction[0]
+def predict_gross(input_data, model):
+    return model.predict_gross(input_data)
 
 
 def predict_gross_range(gross):
@@ -148,6 +31,12 @@ def predict_gross_range(gross):
         return f"Ultra High Revenue (>= 200M)"
 
 
+try:
+    model = load_model(latest_version())
+except FileNotFoundError:
+    st.error("No trained model found. Run `python train.py` to create one in artifacts/.")
+    st.stop()
+
 st.markdown(
     """
     <h1 style='text-align: center; color: cyan;'>Movie Revenue Prediction</h1>
@@ -203,10 +92,13 @@ if submit_button:
         "votes": votes,
     }
 
-    best_model = run_model()
-    predicted_gross = predict_gross(input_data, best_model)
-    predicted_gross_range = predict_gross_range(predicted_gross)
+    predicted_gross = predict_gross(input_data, model)
 
     st.markdown("## Prediction Result")
     st.success(f'Predicted Revenue for "{name}": ${predicted_gross:,.2f}')
-    st.success(f"Predicted Revenue Range: {predicted_gross_range}")
+    if model.residuals is not None:
+        _, low, high = model.predict_gross_interval(input_data, DEFAULT_LEVEL)
+        st.success(f"{DEFAULT_LEVEL:.0%} Prediction Interval: ${low:,.0f} - ${high:,.0f}")
+    else:
+        # Models trained without a calibration split only get the fixed buckets
+        st.success(f"Predicted Revenue Range: {predict_gross_range(predicted_gross)}")
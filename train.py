@@ -0,0 +1,61 @@
+import argparse
+import sys
+
+from models.artifacts import ARTIFACT_ROOT, file_sha256, save_artifact
+from models.conformal import CALIBRATION_SHARE
+from models.training import DATA_PATH, load_training_data, train_model
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process so far, or None where resource is unavailable"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the XGBoost revenue model offline")
+    parser.add_argument("--data", default=DATA_PATH, help="Training CSV")
+    parser.add_argument("--output", default=ARTIFACT_ROOT, help="Artifact root directory")
+    parser.add_argument("--cv", type=int, default=5, help="Cross-validation folds")
+    parser.add_argument("--search", choices=["grid", "halving"], default="grid",
+                        help="Exhaustive grid search or budgeted successive halving")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Wall-clock budget in seconds for --search halving")
+    parser.add_argument("--configs", type=int, default=27,
+                        help="Configurations sampled for --search halving")
+    parser.add_argument("--tuning-log", default=None,
+                        help="JSONL log of finished trials; rerunning with it resumes the search")
+    parser.add_argument("--calibration", type=float, default=CALIBRATION_SHARE,
+                        help="Share of films held out to calibrate prediction intervals (0 disables them)")
+    args = parser.parse_args()
+
+    df = load_training_data(args.data)
+    print(f"Training on {len(df):,} films from {args.data}...")
+    model, preprocessor, metadata = train_model(
+        df, cv=args.cv, search=args.search, budget_seconds=args.budget,
+        tuning_log=args.tuning_log, n_configs=args.configs, calibration_share=args.calibration,
+    )
+    metadata["data_path"] = args.data
+    metadata["data_sha256"] = file_sha256(args.data)
+    metadata["peak_memory_mb"] = peak_memory_mb()
+
+    directory = save_artifact(model, preprocessor, metadata, root=args.output)
+    print(f"Best params: {metadata['params']}")
+    print(f"CV R2: {metadata['cv_r2']:.4f} • Training time: {metadata['training_seconds']}s")
+    print(f"Tuning: {metadata['fits']} fits in {metadata['tuning_seconds']}s • "
+          f"Peak memory: {metadata['peak_memory_mb'] or 'n/a'} MB")
+    conformal = metadata["conformal"]
+    if conformal:
+        print(f"Conformal intervals from {conformal['calibration_rows']:,} held-out films, coverage on the "
+              "other half: " + ", ".join(f"{float(level):.0%} → {value:.1%}"
+                                         for level, value in conformal["coverage"].items()))
+    print(f"Saved model artifact to {directory}")
+
+
+if __name__ == "__main__":
+    main()
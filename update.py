@@ -0,0 +1,69 @@
+import argparse
+
+import pandas as pd
+
+from models.aggregate_cube import load_cube
+from models.artifacts import ARTIFACT_ROOT, file_sha256, load_artifact, save_artifact
+from models.dataset import append_rows
+from models.incremental import REFIT_EVERY, UPDATE_ROUNDS, update_model
+from models.training import DATA_PATH, load_training_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add new releases to the dataset and update the model")
+    parser.add_argument("new_rows", help="CSV of new films with the same columns as the dataset")
+    parser.add_argument("--data", default=DATA_PATH, help="Training CSV the new films are appended to")
+    parser.add_argument("--artifacts", default=ARTIFACT_ROOT, help="Artifact root directory")
+    parser.add_argument("--rounds", type=int, default=UPDATE_ROUNDS,
+                        help="Boosting rounds added by an incremental update")
+    parser.add_argument("--refit", choices=["auto", "always", "never"], default="auto",
+                        help="Full refit: when drift or the schedule calls for it, always, or never")
+    parser.add_argument("--refit-every", type=int, default=REFIT_EVERY,
+                        help="Incremental updates before a scheduled full refit")
+    args = parser.parse_args()
+
+    artifact = load_artifact(args.artifacts)
+    appended = append_rows(pd.read_csv(args.new_rows), args.data)
+    df = load_training_data(args.data)
+    # Every film past the ones the model was trained on, so films appended by
+    # an update that failed before saving its artifact are folded in on the next run
+    pending = len(df) - artifact.metadata["training_rows"]
+    if pending < 0:
+        raise SystemExit(f"{args.data} has {len(df):,} films but {artifact.version} was trained on "
+                         f"{artifact.metadata['training_rows']:,}; retrain it with train.py")
+    if not pending:
+        print(f"No new films in {args.new_rows}; {artifact.version} stays the latest model")
+        return
+    new_rows = df.tail(pending)
+
+    # Folds just the appended films into the aggregate cube behind the rule predictor
+    cube = load_cube(args.data)
+    print(f"Appended {len(appended):,} films to {args.data} ({len(df):,} total), "
+          f"updating {artifact.version} with {pending:,} new films...")
+    model, preprocessor, metadata = update_model(
+        artifact, df, new_rows, rounds=args.rounds, refit=args.refit, refit_every=args.refit_every
+    )
+    metadata["data_path"] = args.data
+    metadata["data_sha256"] = file_sha256(args.data)
+
+    directory = save_artifact(model, preprocessor, metadata, root=args.artifacts)
+    drift = metadata["drift"]
+    print("Drift: " + ", ".join(
+        f"{name} {drift[name]['value']}" for name in ("mean_shift", "std_change", "stale_vocabulary", "r2_drop")
+    ))
+    if metadata["refit_reasons"]:
+        print(f"Full refit: {'; '.join(metadata['refit_reasons'])}")
+    else:
+        print(f"Incremental update: {metadata['updates_since_refit']} since the last full fit, "
+              f"{metadata['trees']} trees")
+    new_categories = {name: count for name, count in drift["new_categories"].items() if count}
+    if new_categories and not metadata["refit_reasons"]:
+        print("Categories the next full refit will add: "
+              + ", ".join(f"{name} {count}" for name, count in new_categories.items()))
+    print(f"Update time: {metadata['update_seconds']}s")
+    print(f"Aggregate cube: {cube.rows:,} films")
+    print(f"Saved model artifact to {directory}")
+
+
+if __name__ == "__main__":
+    main()